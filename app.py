@@ -1,13 +1,16 @@
 import os
-import json
-import random
-from collections import Counter
 import tkinter as tk
 import customtkinter as ctk
-from tkinter import messagebox
+from tkinter import messagebox, simpledialog
+from decision_engine import DecisionEngine, format_rank_histogram, format_tie_set, solution_moods, solution_rank
+from decision_storage import STORAGE_ERRORS, VersionConflict, open_storage, refresh, writing
+from decision_rejections import RejectionStore
+from decision_timeline import AcceptTimeline
+from decision_trends import TrendTracker
+from decision_watch import ChangeWatcher, storage_files
 
 # --- Constants & Original Theme ---
-DECISION_FILE = "decisions.json"
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
 STYLE = {
     "colors": {
         "base": "#002b36",
@@ -23,6 +26,133 @@ STYLE = {
         "body": ("Segoe UI", 13)
     }
 }
+ROW_HEIGHT = 34
+WATCH_INTERVAL_MS = 1000
+
+
+# --- Virtualized Solutions List ---
+class SolutionListView(ctk.CTkFrame):
+    # Only enough rows to fill the visible area are ever created. Scrolling
+    # rebinds that pool of rows to a different slice of the solutions, and
+    # anything the user types is kept in self.edits keyed by solution name,
+    # so edits survive rows being reused for other solutions. Each edit also
+    # keeps the rank and moods its row showed when editing started, which
+    # saving checks nobody else has changed since.
+    def __init__(self, master, on_delete, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_delete = on_delete
+        self.solutions = []
+        self.edits = {}
+        self.offset = 0
+        self.rows = []
+        self._binding = False
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.grid(row=0, column=0, sticky="nsew")
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.rows_frame.grid_propagate(False)
+        self.rows_frame.bind("<Configure>", lambda event: self.render())
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.bind_scroll(self.rows_frame)
+
+    def bind_scroll(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda event: self.scroll_by(-1))
+        widget.bind("<Button-5>", lambda event: self.scroll_by(1))
+
+    def set_solutions(self, solutions, keep_edits=False):
+        if solutions is not self.solutions:
+            self.solutions = solutions
+            if keep_edits:
+                # The same problem reloaded: edits to solutions that still exist stay.
+                names = {sol["solutions"] for sol in solutions}
+                self.edits = {name: edit for name, edit in self.edits.items() if name in names}
+            else:
+                self.edits = {}
+                self.offset = 0
+        self.render()
+
+    def clear_edits(self):
+        self.edits = {}
+        self.render()
+
+    def edit_bases(self):
+        return {name: edit["base"] for name, edit in self.edits.items()}
+
+    def visible_count(self):
+        return max(1, self.rows_frame.winfo_height() // ROW_HEIGHT)
+
+    def scroll_by(self, rows):
+        self.offset += rows
+        self.render()
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.solutions))
+        elif args[0] == "scroll":
+            self.offset += int(args[1]) * (self.visible_count() if args[2] == "pages" else 1)
+        self.render()
+
+    def render(self):
+        count = self.visible_count()
+        while len(self.rows) < count:
+            self.rows.append(self.make_row(len(self.rows)))
+        self.offset = max(0, min(self.offset, len(self.solutions) - count))
+        self._binding = True
+        for i, row in enumerate(self.rows):
+            index = self.offset + i
+            if i < count and index < len(self.solutions):
+                self.bind_row(row, self.solutions[index])
+                row["frame"].grid()
+            else:
+                row["name"] = None
+                row["frame"].grid_remove()
+        self._binding = False
+        total = max(len(self.solutions), 1)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + count) / total))
+
+    def make_row(self, i):
+        colors = STYLE["colors"]
+        row = {"name": None, "rank_var": ctk.StringVar(), "mood_var": ctk.StringVar()}
+        row["frame"] = ctk.CTkFrame(self.rows_frame, fg_color="transparent", height=ROW_HEIGHT)
+        row["frame"].grid(row=i, column=0, sticky="ew")
+        row["frame"].grid_propagate(False)
+        row["frame"].grid_columnconfigure(0, weight=3)
+        row["frame"].grid_columnconfigure(1, weight=1)
+        row["frame"].grid_columnconfigure(2, weight=2)
+        row["label"] = ctk.CTkLabel(row["frame"], text="", text_color=colors["text_highlight"])
+        row["label"].grid(row=0, column=0, sticky="w")
+        rank_entry = ctk.CTkEntry(row["frame"], textvariable=row["rank_var"], width=50,
+                                  text_color=colors["text_highlight"], fg_color=colors["base"])
+        rank_entry.grid(row=0, column=1, padx=5)
+        mood_entry = ctk.CTkEntry(row["frame"], textvariable=row["mood_var"], text_color=colors["text_highlight"],
+                                  fg_color=colors["base"])
+        mood_entry.grid(row=0, column=2, padx=5)
+        ctk.CTkButton(row["frame"], text="🗑️", width=20, fg_color="transparent", text_color="red",
+                      command=lambda: row["name"] and self.on_delete(row["name"])).grid(row=0, column=3, padx=5)
+        row["rank_var"].trace_add("write", lambda *args: self.record_edit(row))
+        row["mood_var"].trace_add("write", lambda *args: self.record_edit(row))
+        for widget in (row["frame"], row["label"], rank_entry, mood_entry):
+            self.bind_scroll(widget)
+        return row
+
+    def bind_row(self, row, sol):
+        row["name"] = sol["solutions"]
+        row["base"] = (solution_rank(sol), tuple(solution_moods(sol)))
+        row["label"].configure(text=sol["solutions"])
+        edit = self.edits.get(sol["solutions"])
+        row["rank_var"].set(edit["ranking"] if edit else str(sol.get("ranking") or 0))
+        row["mood_var"].set(edit["mood"] if edit else ", ".join(solution_moods(sol)))
+
+    def record_edit(self, row):
+        if self._binding or not row["name"]:
+            return
+        edit = self.edits.get(row["name"])
+        self.edits[row["name"]] = {"ranking": row["rank_var"].get(), "mood": row["mood_var"].get(),
+                                   "base": edit["base"] if edit else row["base"]}
 
 
 # --- Main Application ---
@@ -31,15 +161,18 @@ class DecisionApp(ctk.CTk):
         super().__init__()
         # Core App Data
         self.decisions = self.load_json_file(DECISION_FILE)
-        self.decision_log = []
-        self.rejected_solutions = {}
+        self.engine = DecisionEngine(self.decisions)
+        self.trends = TrendTracker(DECISION_FILE + ".trends")
+        self.timeline = AcceptTimeline(DECISION_FILE + ".timeline")
+        self.rejections = RejectionStore(DECISION_FILE + ".rejections")
+        self.watcher = ChangeWatcher(storage_files(DECISION_FILE) + [self.trends.path, self.timeline.path,
+                                                                     self.rejections.path])
 
         # Widget String Variables
         self.problem_var = ctk.StringVar()
         self.solution_var = ctk.StringVar()
         self.preference_var = ctk.StringVar(value="default (random)")
         self.avoid_repeats_var = ctk.BooleanVar(value=False)
-        self.solution_widgets = []
 
         # UI setup
         self.title("✨ Decision Engine")
@@ -57,6 +190,7 @@ class DecisionApp(ctk.CTk):
             self.problem_var.set(list(self.decisions.keys())[0])
         else:
             self.on_problem_change()
+        self.after(WATCH_INTERVAL_MS, self.check_for_changes)
 
     def create_menu(self):
         menubar = tk.Menu(self)
@@ -123,9 +257,9 @@ class DecisionApp(ctk.CTk):
         self.existing_solutions_frame.grid_rowconfigure(1, weight=1)
         ctk.CTkLabel(self.existing_solutions_frame, text="📝 Edit Existing Solutions", font=fonts["header"],
                      text_color=colors["text_highlight"]).grid(row=0, column=0, padx=15, pady=(15, 5), sticky="w")
-        self.solutions_list_frame = ctk.CTkScrollableFrame(self.existing_solutions_frame, fg_color=colors["base"])
-        self.solutions_list_frame.grid(row=1, column=0, sticky="nsew", padx=15, pady=(0, 15))
-        self.solutions_list_frame.grid_columnconfigure(0, weight=1)
+        self.solution_list = SolutionListView(self.existing_solutions_frame, on_delete=self.delete_solution,
+                                              fg_color=colors["base"])
+        self.solution_list.grid(row=1, column=0, sticky="nsew", padx=15, pady=(0, 15))
         ctk.CTkButton(self.existing_solutions_frame, text="Save All Changes", command=self.save_all_changes).grid(row=2,
                                                                                                                   column=0,
                                                                                                                   padx=15,
@@ -153,7 +287,8 @@ class DecisionApp(ctk.CTk):
                                                                                        sticky="w")
         self.preference_dropdown = ctk.CTkComboBox(choose_frame, variable=self.preference_var,
                                                    values=["default (random)", "ranking", "mood", "most chosen",
-                                                           "least chosen", "trendy"],
+                                                           "least chosen", "trendy", "popular (this week)",
+                                                           "weighted (by history)"],
                                                    text_color=colors["text_highlight"], fg_color=colors["base"],
                                                    border_color=colors["purple"], button_color=colors["orange"])
         self.preference_dropdown.grid(row=2, column=1, padx=15, pady=5, sticky="ew")
@@ -178,50 +313,56 @@ class DecisionApp(ctk.CTk):
         self.update_solutions_list()
         self.update_stats()
 
-    def update_solutions_list(self):
-        for widget in self.solutions_list_frame.winfo_children(): widget.destroy()
-        self.solution_widgets = []
+    def update_solutions_list(self, keep_edits=False):
         problem = self.problem_var.get()
-        if not problem: return
-
-        solutions = self.decisions.get(problem, [])
-        for i, sol in enumerate(solutions):
-            sol_frame = ctk.CTkFrame(self.solutions_list_frame, fg_color="transparent")
-            sol_frame.grid(row=i, column=0, sticky="ew", pady=2)
-            sol_frame.grid_columnconfigure(0, weight=3);
-            sol_frame.grid_columnconfigure(1, weight=1);
-            sol_frame.grid_columnconfigure(2, weight=2)
-            ctk.CTkLabel(sol_frame, text=sol['solutions'], text_color=STYLE["colors"]["text_highlight"]).grid(row=0,
-                                                                                                              column=0,
-                                                                                                              sticky="w")
-
-            rank_var = ctk.StringVar(value=str(sol.get("ranking") or 0))
-            mood_var = ctk.StringVar(value=", ".join(sol.get("mood", [])))
-
-            ctk.CTkEntry(sol_frame, textvariable=rank_var, width=50, text_color=STYLE["colors"]["text_highlight"],
-                         fg_color=STYLE["colors"]["base"]).grid(row=0, column=1, padx=5)
-            ctk.CTkEntry(sol_frame, textvariable=mood_var, text_color=STYLE["colors"]["text_highlight"],
-                         fg_color=STYLE["colors"]["base"]).grid(row=0, column=2, padx=5)
-            ctk.CTkButton(sol_frame, text="🗑️", width=20, fg_color="transparent", text_color="red",
-                          command=lambda s=sol['solutions']: self.delete_solution(s)).grid(row=0, column=3, padx=5)
-
-            self.solution_widgets.append({"solution": sol['solutions'], "rank_var": rank_var, "mood_var": mood_var})
+        self.solution_list.set_solutions(self.decisions.get(problem, []) if problem else [], keep_edits)
 
     def save_all_changes(self):
         problem = self.problem_var.get()
         if not problem: return
-        for widget_info in self.solution_widgets:
-            for sol_data in self.decisions[problem]:
-                if sol_data['solutions'] == widget_info['solution']:
-                    try:
-                        sol_data['ranking'] = int(widget_info['rank_var'].get())
-                    except (ValueError, TypeError):
-                        sol_data['ranking'] = 0
-                    sol_data['mood'] = [m.strip().lower() for m in widget_info['mood_var'].get().split(',') if
-                                        m.strip()]
-                    break
-        self.save_json_file(self.decisions, DECISION_FILE)
+        try:
+            with writing(self.engine, self.storage, expect={problem: self.solution_list.edit_bases()}):
+                changed = self.engine.apply_edits(problem, self.solution_list.edits)
+                if changed: self.storage.put_solutions(problem, changed)
+        except VersionConflict as e:
+            messagebox.showwarning("Changed Elsewhere", f"{', '.join(e.names)} in '{problem}' changed elsewhere while you "
+                                   "were editing. Review your edits against the updated list and save again.")
+            edits = self.solution_list.edits
+            for name, edit in edits.items():
+                edit["base"] = self.engine.edit_base(problem, name)
+            self.on_problem_change()
+            self.solution_list.edits = edits; self.solution_list.render(); return
+        except STORAGE_ERRORS as e:
+            messagebox.showerror("Error", f"Failed to save to {self.storage.path}: {e}"); return
+        self.solution_list.clear_edits()
+        if not changed: messagebox.showinfo("Info", "There are no changes to save."); return
         messagebox.showinfo("Success", "All changes have been saved.")
+        self.on_problem_change()
+
+    # --- Changes From Other Processes ---
+    # Checked once a second. Only the problems another process changed are
+    # reloaded, and only if one of them is on screen is the list redrawn,
+    # keeping whatever the user has typed but not saved.
+    def check_for_changes(self):
+        try:
+            if self.watcher.changed():
+                for log in (self.trends, self.timeline, self.rejections):
+                    log.refresh()
+                self.apply_external_changes(refresh(self.engine, self.storage))
+        except STORAGE_ERRORS:
+            pass  # Probably mid-write elsewhere; the next check tries again.
+        self.after(WATCH_INTERVAL_MS, self.check_for_changes)
+
+    def apply_external_changes(self, changed):
+        problem = self.problem_var.get()
+        if changed is None or changed:
+            problems = list(self.decisions.keys())
+            self.problem_combo.configure(values=problems)
+            if problem and problem not in self.decisions:
+                self.problem_var.set(problems[0] if problems else "")
+                return
+            if changed is None or problem in changed:
+                self.update_solutions_list(keep_edits=True)
         self.update_stats()
 
     def update_stats(self):
@@ -229,23 +370,16 @@ class DecisionApp(ctk.CTk):
         if not problem:
             self.stats_text.configure(text="Select a problem to view stats.")
             return
-        stats_solutions = self.decisions.get(problem, [])
-        count_text = f"Solution Count: {len(stats_solutions)}\n"
+        stats = self.engine.stats(problem, timeline=self.timeline)
+        count_text = f"Solution Count: {stats['count']}\n"
         most_chosen_text, least_chosen_text = "Most Chosen: None chosen yet.", "Least Chosen: "
-        if stats_solutions:
-            solutions_with_history = [s for s in stats_solutions if s.get("history", 0) > 0]
-            if solutions_with_history:
-                max_history = max(s['history'] for s in solutions_with_history)
-                most_chosen_list = [s['solutions'] for s in solutions_with_history if s['history'] == max_history]
-                most_chosen_text = f"Most Chosen: {', '.join(most_chosen_list)} ({max_history} times)"
-            unchosen_solutions = [s['solutions'] for s in stats_solutions if s.get('history', 0) == 0]
-            if unchosen_solutions:
-                least_chosen_text += f"{', '.join(unchosen_solutions)} (0 times)"
-            elif solutions_with_history:
-                min_history = min(s['history'] for s in solutions_with_history)
-                least_chosen_list = [s['solutions'] for s in solutions_with_history if s['history'] == min_history]
-                least_chosen_text += f"{', '.join(least_chosen_list)} ({min_history} times)"
-        self.stats_text.configure(text=count_text + most_chosen_text + "\n" + least_chosen_text)
+        if stats["most_chosen"]:
+            most_chosen_text = f"Most Chosen: {format_tie_set(stats['most_chosen'])}"
+        if stats["least_chosen"]:
+            least_chosen_text += format_tie_set(stats["least_chosen"])
+        popular_text = "\nMost Chosen This Week: " + (format_tie_set(stats["popular"]) if stats["popular"] else "None this week.")
+        rank_text = f"\nRanks: {format_rank_histogram(stats)}"
+        self.stats_text.configure(text=count_text + most_chosen_text + "\n" + least_chosen_text + popular_text + rank_text)
 
     def get_solution(self):
         problem = self.problem_var.get()
@@ -253,57 +387,33 @@ class DecisionApp(ctk.CTk):
         solutions = self.decisions.get(problem, [])
         if not solutions: messagebox.showinfo("Info", "This problem has no solutions."); return
 
-        eligible_solutions = solutions
+        exclude = None
         if self.avoid_repeats_var.get():
-            rejected = self.rejected_solutions.get(problem, set())
-            eligible_solutions = [s for s in solutions if s['solutions'] not in rejected]
-            if not eligible_solutions:
+            exclude = self.rejections.exclusion(problem, self.engine)
+            if self.engine.all_excluded(problem, exclude):
                 messagebox.showinfo("Reset", "All options have been suggested. Resetting 'Avoid Repeats' list.")
-                self.rejected_solutions[problem] = set()
-                eligible_solutions = solutions
+                self.save_change(self.rejections.reset, problem)
+                exclude = None
 
         selected, reason = None, ""
         pref_logic = self.preference_var.get().split(" ")[0]
 
         if pref_logic == "ranking":
-            ranked = [s for s in eligible_solutions if s.get("ranking", 0) > 0]
-            if ranked:
-                min_rank = min(s['ranking'] for s in ranked)
-                best = [s for s in ranked if s['ranking'] == min_rank]
-                selected, reason = random.choice(best), f"Chosen for its top rank of {min_rank}."
-            else:
+            selected, reason = self.engine.choose(problem, "ranking", exclude=exclude)
+            if not selected:
                 messagebox.showwarning("Warning", "No solutions have been ranked yet.")
         elif pref_logic == "mood":
-            # Using simpledialog as custom dialog is not available in this context
-            mood = simpledialog.askstring("Input", "What is your current mood?", parent=self)
+            mood = simpledialog.askstring("Input", "What is your current mood? (separate several with commas)", parent=self)
             if mood:
-                mood = mood.lower()
-                mood_matches = [s for s in eligible_solutions if mood in s.get("mood", [])]
-                if mood_matches:
-                    selected, reason = random.choice(mood_matches), f"Chosen for matching the mood '{mood}'."
-                else:
-                    messagebox.showwarning("Warning", f"No solutions found for the mood '{mood}'.")
-        elif pref_logic == "most":
-            hist = [s for s in eligible_solutions if s.get("history", 0) > 0]
-            if hist:
-                max_hist = max(s['history'] for s in hist)
-                most_chosen = [s for s in hist if s['history'] == max_hist]
-                selected, reason = random.choice(most_chosen), f"Chosen for being the most popular ({max_hist} times)."
-        elif pref_logic == "least":
-            min_hist = min(s.get("history", 0) for s in eligible_solutions)
-            least_chosen = [s for s in eligible_solutions if s.get("history", 0) == min_hist]
-            selected, reason = random.choice(least_chosen), f"Chosen for being picked least often ({min_hist} times)."
-        elif pref_logic == "trendy":
-            if self.decision_log:
-                last_5 = self.decision_log[-5:]
-                most_common = Counter(last_5).most_common(1)[0][0]
-                for sol in eligible_solutions:
-                    if sol['solutions'] == most_common:
-                        selected, reason = sol, "Chosen for being trendy recently.";
-                        break
-
-        if not selected and eligible_solutions:
-            selected, reason = random.choice(eligible_solutions), "Chosen at random."
+                selected, reason = self.engine.choose(problem, "mood", mood=mood, exclude=exclude)
+                if not selected:
+                    messagebox.showwarning("Warning", reason)
+        elif pref_logic in ("most", "least", "trendy", "popular", "weighted"):
+            selected, reason = self.engine.choose(problem, pref_logic, exclude=exclude, trends=self.trends,
+                                                  timeline=self.timeline)
+
+        if not selected:
+            selected, reason = self.engine.choose(problem, "default", exclude=exclude)
 
         if selected: self.display_result(problem, selected, reason)
 
@@ -317,40 +427,46 @@ class DecisionApp(ctk.CTk):
         response = messagebox.askquestion("Accept Solution?", f"Do you accept this solution?\n\n{solution_text}",
                                           parent=self)
         if response == 'yes':
-            solution_data['history'] += 1
-            self.decision_log.append(solution_text)
-            self.save_json_file(self.decisions, DECISION_FILE)
+            self.write(lambda: self.engine.record_accept(problem, solution_text),
+                       lambda sol: self.storage.put_solution(problem, sol))
+            self.save_change(self.trends.record, problem, solution_text)
+            self.save_change(self.timeline.record, problem, solution_text)
             self.results_box.insert("end", "Decision Accepted!")
             self.update_stats()
         else:
             if self.avoid_repeats_var.get():
-                self.rejected_solutions.setdefault(problem, set()).add(solution_text)
+                self.save_change(self.rejections.reject, problem, solution_text)
             self.results_box.insert("end", "Decision Rejected.")
 
     def load_json_file(self, filepath):
-        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            with open(filepath, 'w') as f: json.dump({}, f)
-            return {}
+        self.storage = open_storage(filepath)
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            return self.storage.load()
+        except STORAGE_ERRORS:
             messagebox.showerror("Error", f"{filepath} is corrupted or missing.");
-            return {}
+            return self.storage.decisions
+
+    def save_change(self, change, *args):
+        try:
+            change(*args)
+        except STORAGE_ERRORS as e:
+            messagebox.showerror("Error", f"Failed to save to {self.storage.path}: {e}")
 
-    def save_json_file(self, data, filepath):
+    def write(self, change, save):
+        # Runs the engine change on top of whatever other processes saved
+        # meanwhile, then saves its result if it changed anything.
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=4)
-        except (OSError, PermissionError) as e:
-            messagebox.showerror("Error", f"Failed to save to {filepath}: {e}")
+            with writing(self.engine, self.storage):
+                result = change()
+                if result: save(result)
+                return result
+        except STORAGE_ERRORS as e:
+            messagebox.showerror("Error", f"Failed to save to {self.storage.path}: {e}")
 
     def add_problem(self):
         problem = self.new_problem_entry.get()
         if not problem: messagebox.showwarning("Missing Input", "Problem name cannot be empty."); return
-        if problem not in self.decisions:
-            self.decisions[problem] = []
-            self.save_json_file(self.decisions, DECISION_FILE)
+        if self.write(lambda: self.engine.add_problem(problem), lambda _: self.storage.add_problem(problem)):
             self.problem_combo.configure(values=list(self.decisions.keys()))
             self.problem_var.set(problem)
             self.new_problem_entry.delete(0, 'end')
@@ -361,9 +477,9 @@ class DecisionApp(ctk.CTk):
         problem, solution = self.problem_var.get(), self.solution_var.get()
         if not problem: messagebox.showerror("Error", "Please select a problem first."); return
         if not solution: messagebox.showwarning("Missing Input", "Solution cannot be empty."); return
-        if solution not in [s['solutions'] for s in self.decisions[problem]]:
-            self.decisions[problem].append({"solutions": solution, "ranking": 0, "mood": [], "history": 0})
-            self.save_json_file(self.decisions, DECISION_FILE)
+        sol = self.write(lambda: self.engine.add_solution(problem, solution),
+                         lambda sol: self.storage.put_solution(problem, sol))
+        if sol is not None:
             self.solution_var.set("");
             self.on_problem_change()
         else:
@@ -374,8 +490,7 @@ class DecisionApp(ctk.CTk):
         if not problem: return
         if messagebox.askyesno("Confirm Deletion",
                                f"Are you sure you want to delete '{problem}' and all its solutions? This cannot be undone."):
-            del self.decisions[problem]
-            self.save_json_file(self.decisions, DECISION_FILE)
+            self.write(lambda: self.engine.delete_problem(problem), lambda _: self.storage.delete_problem(problem))
             remaining_problems = list(self.decisions.keys())
             self.problem_combo.configure(values=remaining_problems)
             self.problem_var.set(remaining_problems[0] if remaining_problems else "")
@@ -383,18 +498,21 @@ class DecisionApp(ctk.CTk):
     def delete_solution(self, solution_to_delete):
         problem = self.problem_var.get()
         if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete '{solution_to_delete}'?"):
-            self.decisions[problem] = [s for s in self.decisions[problem] if s['solutions'] != solution_to_delete]
-            self.save_json_file(self.decisions, DECISION_FILE)
+            self.write(lambda: self.engine.delete_solution(problem, solution_to_delete),
+                       lambda _: self.storage.delete_solution(problem, solution_to_delete))
             self.on_problem_change()
 
     def show_how_it_works(self):
         message = (
             "- Default (Random): Picks any solution at random.\n"
             "- Ranking: Picks from solutions with the lowest rank number (1 is best).\n"
-            "- Mood: Suggests a solution matching your entered mood.\n"
+            "- Mood: Suggests a solution matching your entered moods; several can be given with commas, and a\n"
+            "  prefix or near-miss spelling finds the closest mood.\n"
             "- Most Chosen: Picks from solutions with the highest history count.\n"
             "- Least Chosen: Picks from solutions with the lowest history count.\n"
             "- Trendy: Picks the solution chosen most often in the last 5 accepted decisions.\n"
+            "- Popular: Picks the solution accepted most often in the last 7 days.\n"
+            "- Weighted: Picks solutions in proportion to how often each has been chosen.\n"
             "- Avoid Repeats: Prevents recently rejected solutions from being suggested."
         )
         messagebox.showinfo("How It Works", message)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+from decision_engine import POPULAR_DAYS, DecisionEngine, STRATEGY_ALIASES, normalize_strategy
+from decision_moods import MOOD_MATCHES
+from decision_storage import STORAGE_ERRORS, open_storage, writing
+
+# Headless entry point for cron jobs and shell pipelines:
+#
+#     python decide.py dinner --strategy mood --mood cozy
+#     python decide.py dinner --strategy weighted --accept --json
+#     python decide.py --batch requests.jsonl --accept > results.jsonl
+#
+# Only the engine and storage are imported (no Flask, Tk or Streamlit), and
+# the JSON backend reads just the problem it is asked about, so a run costs
+# little more than starting Python.
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
+FLUSH_EVERY = 1000
+BATCH_CACHE_SIZE = 4096
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="decide", description="Pick a solution for a problem without any prompts.")
+    parser.add_argument("problem", nargs="?")
+    parser.add_argument("-s", "--strategy", default="default", help="one of: " + ", ".join(sorted(set(STRATEGY_ALIASES.values()))))
+    parser.add_argument("-m", "--mood", default="", help="one or more comma-separated moods")
+    parser.add_argument("--match", choices=MOOD_MATCHES, default="best", help="how several moods combine (default best)")
+    parser.add_argument("--days", type=float, default=POPULAR_DAYS,
+                        help=f"how far back the popular strategy looks (default {POPULAR_DAYS})")
+    parser.add_argument("-x", "--exclude", action="append", default=[], help="skip this solution (repeatable)")
+    parser.add_argument("-a", "--accept", action="store_true", help="record the choice in the history")
+    parser.add_argument("-f", "--file", default=DECISION_FILE, help="decisions file (default: $DECISION_FILE or decisions.json)")
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    parser.add_argument("-b", "--batch", metavar="FILE",
+                        help="read JSONL {problem, strategy, mood, match, exclude, days} requests from FILE ('-' for stdin) "
+                             "and write JSONL results to stdout; --strategy, --mood and --match are the defaults")
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY, metavar="N",
+                        help=f"with --batch --accept, write accepted history once per N records (default {FLUSH_EVERY})")
+    parser.add_argument("--cache-size", type=int, default=BATCH_CACHE_SIZE, metavar="N",
+                        help=f"with --batch, keep at most N problems parsed in memory (default {BATCH_CACHE_SIZE})")
+    return parser
+
+
+# --- Batch Mode ---
+# Requests are read, decided and written one line at a time. Accepted
+# choices are held back and written together once every --flush-every
+# records, and sooner if the problem cache could otherwise drop a problem
+# whose new history has not been written yet. A problem another process
+# changed in the meantime is re-read at flush time, and the accepts held back
+# for it are counted again on top of what that process saved.
+class AcceptBuffer:
+    def __init__(self, engine, storage, trends, timeline):
+        self.engine = engine
+        self.storage = storage
+        self.trends = trends
+        self.timeline = timeline
+        self.counts = Counter()
+        self.accepts = []
+        self.touched = set()
+
+    def add(self, problem, name):
+        self.counts[problem, name] += 1
+        self.accepts.append((problem, name, None))
+
+    def flush(self):
+        with writing(self.engine, self.storage) as changed:
+            changes = []
+            for (problem, name), count in self.counts.items():
+                if changed is None or problem in changed:
+                    for _ in range(count):
+                        sol = self.engine.record_accept(problem, name)
+                else:
+                    sol = self.engine.get_solution(problem, name)
+                if sol is not None:
+                    changes.append((problem, sol))
+            self.storage.put_batch(changes)
+        self.trends.record_many(self.accepts)
+        self.timeline.record_many(self.accepts)
+        self.counts, self.accepts = Counter(), []
+        self.touched.clear()
+
+
+def run_batch(args, storage, out=sys.stdout):
+    decisions = storage.load()
+    capacity = None
+    if hasattr(decisions, "capacity"):
+        # With --accept there is room for every problem one flush can touch,
+        # so a flush is only forced early by records that were not accepted.
+        capacity = decisions.capacity = max(args.cache_size, args.flush_every + 1 if args.accept else 1)
+    engine = DecisionEngine(decisions, max_indexes=capacity)
+    from decision_timeline import AcceptTimeline
+    from decision_trends import TrendTracker
+    trends = TrendTracker(args.file + ".trends")
+    timeline = AcceptTimeline(args.file + ".timeline")
+    buffer = AcceptBuffer(engine, storage, trends, timeline) if args.accept else None
+    defaults = {"strategy": args.strategy, "mood": args.mood, "match": args.match, "exclude": args.exclude,
+                "days": args.days}
+    source = sys.stdin if args.batch == "-" else open(args.batch, 'r')
+    try:
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                out.write(json.dumps({"line": number, "error": f"Invalid JSON: {e}"}) + "\n")
+                continue
+            if not isinstance(item, dict):
+                out.write(json.dumps({"line": number, "error": "Expected a JSON object."}) + "\n")
+                continue
+            try:
+                result = engine.decide({**defaults, **item}, trends=trends, timeline=timeline)
+            except Exception as e:
+                # One bad record must not end a long run; report it and go on.
+                out.write(json.dumps({"line": number, "error": f"{type(e).__name__}: {e}"}) + "\n")
+                continue
+            if buffer is not None and "error" not in result:
+                problem = result["problem"]
+                buffer.touched.add(problem)
+                if result["solution"] is not None and engine.record_accept(problem, result["solution"]) is not None:
+                    buffer.add(problem, result["solution"])
+                if len(buffer.accepts) >= args.flush_every or (capacity and len(buffer.touched) >= capacity):
+                    buffer.flush()
+                    out.flush()
+            out.write(json.dumps(result) + "\n")
+        if buffer is not None:
+            buffer.flush()
+        out.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); keep what was already emitted.
+        if buffer is not None:
+            buffer.flush()
+        raise
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        trends.close()
+        timeline.close()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.problem is None) == (args.batch is None):
+        parser.error("give either a problem or --batch FILE")
+    if args.flush_every < 1 or args.cache_size < 1:
+        parser.error("--flush-every and --cache-size must be at least 1")
+    storage = open_storage(args.file)
+    if args.batch is not None:
+        try:
+            run_batch(args, storage)
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except STORAGE_ERRORS as e:
+            sys.exit(f"decide: {args.file}: {e}")
+        finally:
+            storage.close()
+        return 0
+    trends = timeline = None
+    strategy = normalize_strategy(args.strategy)
+    try:
+        engine = DecisionEngine(storage.load())
+        if args.accept or strategy == "trendy":
+            from decision_trends import TrendTracker
+            trends = TrendTracker(args.file + ".trends")
+        if args.accept or strategy == "popular":
+            from decision_timeline import AcceptTimeline
+            timeline = AcceptTimeline(args.file + ".timeline")
+        result = engine.decide({"problem": args.problem, "strategy": args.strategy, "mood": args.mood,
+                                "match": args.match, "exclude": args.exclude, "days": args.days},
+                               trends=trends, timeline=timeline)
+        if args.accept and result["solution"] is not None:
+            with writing(engine, storage):
+                # None when another process deleted the choice meanwhile.
+                accepted = engine.record_accept(args.problem, result["solution"])
+                if accepted is not None:
+                    storage.put_solution(args.problem, accepted)
+            if accepted is not None:
+                trends.record(args.problem, result["solution"])
+                timeline.record(args.problem, result["solution"])
+    except STORAGE_ERRORS as e:
+        sys.exit(f"decide: {args.file}: {e}")
+    finally:
+        storage.close()
+        for log in (trends, timeline):
+            if log is not None:
+                log.close()
+
+    if args.json:
+        print(json.dumps(result))
+    elif result["solution"] is not None:
+        print(result["solution"])
+    else:
+        print(result.get("error") or result["reason"], file=sys.stderr)
+    return 0 if result["solution"] is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
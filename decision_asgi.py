@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+
+from decision_engine import DecisionEngine
+from decision_storage import STORAGE_ERRORS, invalidate_changed, open_storage
+from decision_timeline import AcceptTimeline
+from decision_trends import TrendTracker
+from decision_watch import ChangeWatcher, storage_files
+
+# Async serving mode, for use alongside the Flask app in decision_maker.py:
+#
+#     uvicorn decision_asgi:app --workers 4
+#
+# Each worker process loads the decisions once. Reads (/decide) run straight
+# off the in-memory indexes. Every change (/accept) goes through a queue
+# drained by one writer task, and each batch is applied on top of whatever
+# the other workers saved meanwhile, so history increments are never lost to
+# interleaved read-modify-write cycles, within a process or across them.
+# Reads share the storage's view_lock, which the writer thread takes only
+# while it changes memory: waiting for another worker's write lock and the
+# file writes themselves happen outside it, so the event loop never blocks
+# on another process. Each /decide also asks a ChangeWatcher (one
+# non-blocking read) whether any worker saved something; if so the engine,
+# trends and timeline catch up in a thread, and requests answered meanwhile
+# see the state from just before that save.
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
+MAX_BATCH = 1000
+MAX_BODY = 1024 * 1024
+
+
+class DecisionService:
+    def __init__(self, path):
+        self.storage = open_storage(path)
+        self.engine = DecisionEngine(self.storage.load())
+        self.trends = TrendTracker(path + ".trends")
+        self.timeline = AcceptTimeline(path + ".timeline")
+        self.watcher = ChangeWatcher(storage_files(path) + [path + ".trends", path + ".timeline"])
+        self.stale = False
+        self.refreshing = None
+        self.memory = self.storage.view_lock
+        self.queue = None
+        self.writer = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        if self.writer is not None:
+            await self.queue.put(None)
+            await self.writer
+            self.writer = None
+        if self.refreshing is not None:
+            await self.refreshing
+        self.storage.close()
+        self.trends.close()
+        self.timeline.close()
+        self.watcher.close()
+
+    def catch_up(self):
+        """Start catching up if another worker saved something; return the running task, if any."""
+        if self.refreshing is None and (self.stale or self.watcher.changed()):
+            self.stale = False
+            self.refreshing = asyncio.create_task(asyncio.to_thread(self._catch_up))
+            self.refreshing.add_done_callback(lambda task: setattr(self, "refreshing", None))
+        return self.refreshing
+
+    def _catch_up(self):
+        try:
+            with self.storage.transaction() as changed:
+                with self.memory:
+                    invalidate_changed(self.engine, changed)
+            self.trends.refresh()
+            self.timeline.refresh()
+        except STORAGE_ERRORS:
+            self.stale = True  # Probably mid-write elsewhere; the next request tries again.
+
+    def decide(self, items):
+        with self.memory:
+            return [self.engine.decide(item, trends=self.trends, timeline=self.timeline) for item in items]
+
+    async def accept(self, problem, name):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((problem, name, future))
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            jobs = [await self.queue.get()]
+            while not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+            stopping = None in jobs
+            jobs = [job for job in jobs if job is not None]
+
+            results, error = [None] * len(jobs), None
+            if jobs:
+                try:
+                    results = await asyncio.to_thread(self._apply, [(problem, name) for problem, name, _ in jobs])
+                except Exception as e:
+                    # Fails this batch only; the writer keeps serving the next one.
+                    error = e
+            for (problem, name, future), result in zip(jobs, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            if stopping:
+                return
+
+    def _apply(self, accepts):
+        # Runs in a worker thread. The transaction waits for other workers
+        # and catches up without self.memory; readers only wait while the
+        # engine catches up and records the accepts.
+        with self.storage.transaction() as changed:
+            with self.memory:
+                invalidate_changed(self.engine, changed)
+                results, changes = [], []
+                for problem, name in accepts:
+                    sol = self.engine.record_accept(problem, name) if problem in self.engine.decisions else None
+                    results.append(None if sol is None else {"problem": problem, "solution": name, "history": sol["history"]})
+                    if sol is not None:
+                        changes.append((problem, sol))
+            self.storage.put_batch(changes)
+        accepted = [(problem, name, None) for (problem, name), result in zip(accepts, results) if result is not None]
+        self.trends.record_many(accepted)
+        self.timeline.record_many(accepted)
+        return results
+
+
+# --- ASGI Plumbing ---
+service = None
+
+
+async def get_service():
+    global service
+    if service is None:
+        service = DecisionService(DECISION_FILE)
+        await service.start()
+    return service
+
+
+async def read_json(receive):
+    body, more = b"", True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+        if len(body) > MAX_BODY:
+            return None
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    global service
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await get_service()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if service is not None:
+                await service.stop()
+                service = None
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    if scope["method"] != "POST":
+        return await send_json(send, 405, {"error": "Only POST is supported."})
+
+    current = await get_service()
+    payload = await read_json(receive)
+    if scope["path"] == "/decide":
+        items = payload.get("items") if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return await send_json(send, 400, {"error": "Expected a JSON list of {problem, strategy, mood, match, exclude} items."})
+        if len(items) > MAX_BATCH:
+            return await send_json(send, 413, {"error": f"At most {MAX_BATCH} items can be decided per request."})
+        current.catch_up()
+        return await send_json(send, 200, {"decisions": current.decide(items)})
+    if scope["path"] == "/accept":
+        if not (isinstance(payload, dict) and isinstance(payload.get("problem"), str)
+                and isinstance(payload.get("solution"), str)):
+            return await send_json(send, 400, {"error": "Expected a JSON object with 'problem' and 'solution' strings."})
+        try:
+            result = await current.accept(payload["problem"], payload["solution"])
+        except STORAGE_ERRORS as e:
+            return await send_json(send, 500, {"error": f"Failed to save to {DECISION_FILE}: {e}"})
+        if result is None:
+            return await send_json(send, 404, {"error": "Unknown problem or solution."})
+        return await send_json(send, 200, result)
+    return await send_json(send, 404, {"error": f"No route for {scope['path']}."})
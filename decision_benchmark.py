@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from decision_engine import DecisionEngine
+from decision_journal import DecisionJournal, write_snapshot_parts
+from decision_timeline import DAY, AcceptTimeline
+from decision_trends import TrendTracker
+
+# Reproducible benchmarks for the shared engine and storage that
+# decision_maker.py, app.py and web_app.py all call into.
+#
+#     python decision_benchmark.py generate --problems 1000 --options 100 --out big.json
+#     python decision_benchmark.py run --sizes 10x10 100x100 1000x1000 --output results.json
+#
+# Results are JSON so runs from different releases can be diffed.
+DEFAULT_SIZES = ["10x10", "100x100", "1000x1000"]
+MOODS = ["cheap", "fast", "healthy", "fancy", "cozy", "spicy", "sweet", "quick", "outdoor", "late",
+         "rainy", "social", "quiet", "treat", "family", "solo", "hungry", "tired", "bored", "celebrate"]
+STRATEGIES = ["default", "ranking", "mood", "most", "least", "weighted", "history", "trendy", "popular"]
+SAMPLE_PROBLEMS = 100
+EAGER_LOAD_MAX = 10_000_000  # solutions; above this only the lazy load is timed
+
+
+# --- Synthetic Data ---
+def synthetic_solution(rng, i):
+    # Ranks are mostly small with a fifth left unranked, mood counts vary from
+    # none to three, and history follows a long tail like real usage does.
+    rank = 0 if rng.random() < 0.2 else min(10, int(rng.expovariate(0.6)) + 1)
+    moods = rng.sample(MOODS, rng.choice([0, 1, 1, 2, 2, 3]))
+    history = int(rng.paretovariate(1.2)) - 1 if rng.random() < 0.7 else 0
+    return {"solutions": f"option {i}", "ranking": rank, "mood": moods, "history": min(history, 10_000)}
+
+
+def synthetic_problem(rng, options):
+    return [synthetic_solution(rng, i) for i in range(options)]
+
+
+def generate_dataset(path, problems, options, seed=0):
+    # Streams one problem at a time so the largest sizes never sit in memory,
+    # and writes the offset index with it so a lazy load need not scan the file.
+    rng = random.Random(seed)
+    write_snapshot_parts(((f"problem {p}", json.dumps(synthetic_problem(rng, options)).encode())
+                          for p in range(problems)), path)
+
+
+# --- Timing ---
+def measure(name, size, func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return {
+        "name": name,
+        "size": size,
+        "repeat": repeat,
+        "mean_us": statistics.fmean(samples) / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] / 1000,
+        "min_us": samples[0] / 1000,
+    }
+
+
+def bench_size(problems, options, repeat, seed, workdir):
+    # Everything after the load runs on a lazily loaded journal and on a
+    # sample of problems that fits its cache, so memory follows the sample
+    # rather than the dataset and the largest sizes run on ordinary hardware.
+    size = f"{problems}x{options}"
+    path = os.path.join(workdir, f"decisions-{size}.json")
+    generate_dataset(path, problems, options, seed)
+    results = []
+    if problems * options <= EAGER_LOAD_MAX:
+        results.append(measure("load", size, lambda: DecisionJournal(path).load(), max(1, min(repeat, 5))))
+    results.append(measure("load_lazy", size, lambda: DecisionJournal(path, lazy=True).load(), max(1, min(repeat, 5))))
+
+    journal = DecisionJournal(path, compact_every=0, sync=False, lazy=True)
+    decisions = journal.load()
+    engine = DecisionEngine(decisions, max_indexes=decisions.capacity)
+    trends = TrendTracker(os.path.join(workdir, f"decisions-{size}.trends"))
+    timeline = AcceptTimeline(os.path.join(workdir, f"decisions-{size}.timeline"))
+    rng = random.Random(seed)
+    names = rng.sample(list(decisions), min(problems, SAMPLE_PROBLEMS, decisions.capacity))
+    problem = names[0]
+    results.append(measure("index_build", size, lambda: engine.invalidate(problem) or engine.index(problem),
+                           max(1, min(repeat, 20))))
+
+    for _ in range(20):
+        trends.record(problem, rng.choice(decisions[problem])["solutions"])
+    now = time.time()
+    timeline.record_many([(target, rng.choice(decisions[target])["solutions"], now - rng.random() * 30 * DAY)
+                          for target in names for _ in range(5)])
+    # Indexes (and what each strategy builds on them lazily) are made once per
+    # problem; warm the sampled ones first so choose:* times the steady state only.
+    for target in names:
+        for strategy in STRATEGIES:
+            engine.choose(target, strategy, mood=MOODS[0], trends=trends, timeline=timeline)
+    for strategy in STRATEGIES:
+        results.append(measure(f"choose:{strategy}", size,
+                               lambda: engine.choose(rng.choice(names), strategy, mood=rng.choice(MOODS),
+                                                     trends=trends, timeline=timeline), repeat))
+
+    def accept():
+        target = rng.choice(names)
+        sol = engine.choose(target, "default")[0]
+        if sol is not None:
+            journal.put_solution(target, engine.record_accept(target, sol["solutions"]))
+
+    results.append(measure("accept", size, accept, repeat))
+    results.append(measure("stats", size, lambda: engine.stats(rng.choice(names)), repeat))
+    # Compaction copies problems that were never parsed straight from the old snapshot.
+    results.append(measure("snapshot_save", size, journal.compact, max(1, min(repeat, 5))))
+    journal.close()
+    trends.close()
+    timeline.close()
+    return results
+
+
+def parse_size(text):
+    problems, _, options = text.lower().partition("x")
+    return int(problems), int(options)
+
+
+def run(sizes, repeat, seed):
+    workdir = tempfile.mkdtemp(prefix="decision-bench-")
+    try:
+        results = []
+        for text in sizes:
+            problems, options = parse_size(text)
+            print(f"Benchmarking {problems} problems x {options} options...", file=sys.stderr)
+            results.extend(bench_size(problems, options, repeat, seed, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "seed": seed,
+                 "repeat": repeat, "sizes": sizes, "timestamp": time.time()},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the decision engine and storage.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="write a synthetic decisions.json")
+    generate.add_argument("--problems", type=int, default=10)
+    generate.add_argument("--options", type=int, default=10)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--out", default="decisions-synthetic.json")
+    bench = commands.add_parser("run", help="time load, every strategy, accept, stats and save")
+    bench.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="PROBLEMSxOPTIONS, e.g. 100000x1000")
+    bench.add_argument("--repeat", type=int, default=200)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate_dataset(args.out, args.problems, args.options, args.seed)
+        return
+    report = run(args.sizes, args.repeat, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+
+from decision_engine import DecisionEngine, new_solution, parse_rank, solution_history, solution_moods, solution_rank
+from decision_storage import STORAGE_ERRORS, open_storage, writing
+
+# Bulk import and export of options as CSV or JSONL:
+#
+#     python decision_bulk.py import catalogue.csv
+#     python decision_bulk.py import dinner.jsonl --problem dinner
+#     python decision_bulk.py export backup.csv
+#     python decision_bulk.py export - --problem dinner --format jsonl
+#
+# Every row is one option: problem, solution, ranking, mood, history (CSV
+# with a header row; "solutions" is accepted for "solution", and --problem
+# fills in rows without a problem). Import reads the rows one at a time and
+# folds duplicates together in a dict per problem, then merges the lot into
+# the saved data and writes every change as one batch. A row that names an
+# existing option merges into it: a given rank replaces the old one, moods
+# are added to the old ones, and history keeps the larger count (so importing
+# the same file twice changes nothing). Export streams one problem at a time.
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
+FIELDS = ("problem", "solution", "ranking", "mood", "history")
+FORMATS = ("csv", "jsonl")
+
+
+def guess_format(path, format=None):
+    if format:
+        return format
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+# --- Reading Rows ---
+def read_rows(f, format):
+    """Yield ``(line, row dict)`` per record, or ``(line, error)`` for a record that cannot be parsed."""
+    if format == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object."
+
+
+@functools.lru_cache(maxsize=4096)
+def _moods(value):
+    # Catalogues repeat the same few mood strings, so each is split once.
+    return tuple(dict.fromkeys(solution_moods({"mood": value})))
+
+
+def parse_row(row, problem=None):
+    """Return ``(problem, name, (rank or None, moods, history or None))`` for one row, or an error string."""
+    problem = row.get("problem") or problem
+    name = row.get("solution", row.get("solutions"))
+    if not isinstance(problem, str) or not problem.strip():
+        return "Missing problem."
+    if not isinstance(name, str) or not name.strip():
+        return "Missing solution."
+    ranking = row.get("ranking", row.get("rank"))
+    history = row.get("history")
+    moods = row.get("mood", row.get("moods")) or ()
+    if not isinstance(moods, str) and not (isinstance(moods, (list, tuple))
+                                           and all(isinstance(mood, str) for mood in moods)):
+        return "Invalid mood."
+    return (problem.strip(), name.strip(),
+            (None if ranking in (None, "") else parse_rank(ranking),
+             _moods(moods if isinstance(moods, str) else tuple(moods)),
+             None if history in (None, "") else max(0, parse_rank(history))))
+
+
+def merge_fields(old, new):
+    rank = new[0] if new[0] is not None else old[0]
+    moods = old[1] + tuple(mood for mood in new[1] if mood not in old[1])
+    history = old[2] if new[2] is None else new[2] if old[2] is None else max(old[2], new[2])
+    return rank, moods, history
+
+
+# --- Import ---
+def collect(rows, problem=None, errors=None):
+    """Fold rows into ``{problem: {name: fields}}``; return it with the number of rows read."""
+    incoming, count = {}, 0
+    for number, row in rows:
+        parsed = parse_row(row, problem) if isinstance(row, dict) else row
+        if isinstance(parsed, str):
+            if errors is not None:
+                errors.append((number, parsed))
+            continue
+        count += 1
+        row_problem, name, fields = parsed
+        options = incoming.get(row_problem)
+        if options is None:
+            options = incoming[row_problem] = {}
+        old = options.get(name)
+        options[name] = fields if old is None else merge_fields(old, fields)
+    return incoming, count
+
+
+def merge_problem(solutions, options):
+    """Merge ``{name: fields}`` into a copy of ``solutions``; return (new list, changed solutions, added)."""
+    solutions = list(solutions)
+    positions = {sol["solutions"]: i for i, sol in enumerate(solutions)}
+    changed, added = [], 0
+    for name, fields in options.items():
+        i = positions.get(name)
+        if i is None:
+            rank, moods, history = fields
+            sol = new_solution(name, rank or 0, moods, history or 0)
+            positions[name] = len(solutions)
+            solutions.append(sol)
+            added += 1
+        else:
+            old = solutions[i]
+            current = (solution_rank(old), tuple(solution_moods(old)), solution_history(old))
+            merged = merge_fields(current, fields)
+            if merged == current:
+                continue
+            # A new object rather than an in-place edit, so nothing that still
+            # holds the old list sees it half-changed.
+            sol = solutions[i] = new_solution(name, *merged)
+        changed.append(sol)
+    return solutions, changed, added
+
+
+def import_rows(engine, storage, incoming):
+    """Merge collected rows into the saved decisions with one batched write; return (added, updated)."""
+    added = updated = 0
+    if hasattr(engine.decisions, "capacity"):
+        # Keep every imported problem parsed until the batch is written, so
+        # compacting it afterwards does not read them back from the journal.
+        engine.decisions.capacity = max(engine.decisions.capacity, 2 * len(incoming))
+    with writing(engine, storage):
+        changes = []
+        for problem, options in incoming.items():
+            solutions, changed, new = merge_problem(engine.decisions.get(problem, ()), options)
+            if not changed:
+                continue
+            engine.set_solutions(problem, solutions)
+            changes.extend((problem, sol) for sol in changed)
+            added += new
+            updated += len(changed) - new
+        storage.put_batch(changes)
+    return added, updated
+
+
+# --- Export ---
+def export_rows(decisions, problems=None):
+    for problem in problems or decisions:
+        for sol in decisions.get(problem, ()):
+            yield problem, sol
+
+
+def write_rows(out, rows, format):
+    count = 0
+    if format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+        for problem, sol in rows:
+            writer.writerow((problem, sol["solutions"], solution_rank(sol), ", ".join(solution_moods(sol)),
+                             solution_history(sol)))
+            count += 1
+        return count
+    for problem, sol in rows:
+        out.write(json.dumps({"problem": problem, "solution": sol["solutions"], "ranking": solution_rank(sol),
+                              "mood": list(solution_moods(sol)), "history": solution_history(sol)}) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export options as CSV or JSONL.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="file to read or write ('-' for stdin/stdout)")
+    parser.add_argument("-p", "--problem", action="append",
+                        help="import: problem for rows that name none; export: only this problem (repeatable)")
+    parser.add_argument("--format", choices=FORMATS, help="default: csv for .csv paths, otherwise jsonl")
+    parser.add_argument("-f", "--file", default=DECISION_FILE, help="decisions file (default: $DECISION_FILE or decisions.json)")
+    args = parser.parse_args(argv)
+    format = guess_format(args.path, args.format)
+    if args.command == "import" and args.problem and len(args.problem) > 1:
+        parser.error("import takes at most one --problem")
+
+    if args.path == "-":
+        stream = sys.stdout if args.command == "export" else sys.stdin
+    else:
+        try:
+            stream = open(args.path, 'w' if args.command == "export" else 'r', newline='')
+        except OSError as e:
+            sys.exit(f"{args.path}: {e.strerror}")
+    storage = open_storage(args.file)
+    try:
+        decisions = storage.load()
+        if args.command == "export":
+            missing = [problem for problem in args.problem or () if problem not in decisions]
+            if missing:
+                sys.exit(f"Unknown problem '{missing[0]}'.")
+            try:
+                count = write_rows(stream, export_rows(decisions, args.problem), format)
+                stream.flush()
+            except BrokenPipeError:
+                # The reader went away (e.g. `| head`).
+                os.dup2(os.open(os.devnull, os.O_WRONLY), stream.fileno())
+                return 0
+            print(f"Exported {count} options.", file=sys.stderr)
+            return 0
+        errors = []
+        incoming, count = collect(read_rows(stream, format), args.problem[0] if args.problem else None, errors)
+        for number, error in errors:
+            print(f"{args.path}:{number}: {error}", file=sys.stderr)
+        added, updated = import_rows(DecisionEngine(decisions), storage, incoming)
+    except STORAGE_ERRORS as e:
+        sys.exit(f"{args.file}: {e}")
+    finally:
+        storage.close()
+        if stream not in (sys.stdin, sys.stdout):
+            stream.close()
+    options = sum(len(options) for options in incoming.values())
+    print(f"Read {count} rows ({count - options} duplicates merged): {added} options added, {updated} updated, "
+          f"{options - added - updated} unchanged, {len(errors)} rows skipped.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
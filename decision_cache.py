@@ -0,0 +1,87 @@
+import threading
+from contextlib import contextmanager
+
+from decision_engine import DecisionEngine
+from decision_storage import STORAGE_ERRORS, open_storage, refresh, writing
+from decision_watch import ChangeWatcher, storage_files
+
+
+class SharedDecisions:
+    """One in-process copy of the decisions, engine and storage, shared by every session.
+
+    ``refresh()`` picks up what other processes wrote, reloading only the
+    problems they changed; a ChangeWatcher keeps that to one cheap check when
+    nothing did. Our own writes go through ``writing()``, which applies them
+    on top of the latest saved data (see decision_storage.py). ``version``
+    goes up on every change, so callers can tell when cached views are out of
+    date, and ``changed_since()`` tells them which problems to redraw.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.version = 0
+        self.storage = None
+        self.load_error = None
+        self.watcher = ChangeWatcher(storage_files(path))
+        self._load()
+
+    def _load(self):
+        if self.storage is not None:
+            self.storage.close()
+        self.storage = open_storage(self.path)
+        try:
+            self.decisions = self.storage.load()
+            self.load_error = None
+        except STORAGE_ERRORS as e:
+            self.decisions = self.storage.decisions
+            self.load_error = e
+        self.engine = DecisionEngine(self.decisions)
+        self.version += 1
+
+    def refresh(self):
+        with self.lock:
+            if self.watcher.changed():
+                try:
+                    changed = refresh(self.engine, self.storage)
+                except STORAGE_ERRORS:
+                    self._load()
+                    return self.version
+                if changed is None or changed:
+                    self.version += 1
+            return self.version
+
+    def changed_since(self, seen):
+        """Problems changed since ``seen`` (an earlier ``engine_stamp()``), or None if all may have."""
+        epoch, generation = seen or (None, 0)
+        if epoch != self.engine.epoch:
+            return None
+        return {problem for problem, version in self.engine.versions.items() if version > generation}
+
+    def engine_stamp(self):
+        return self.engine.epoch, self.engine.generation
+
+    def choose(self, *args, **kwargs):
+        # Choices are O(1) against the indexes, so holding the lock costs
+        # little and keeps a reader from seeing a half-applied write.
+        with self.lock:
+            return self.engine.choose(*args, **kwargs)
+
+    def stats(self, *args, **kwargs):
+        with self.lock:
+            return self.engine.stats(*args, **kwargs)
+
+    def exclusion(self, rejections, problem):
+        """``rejections``' exclusion for ``problem``, and whether it leaves nothing to choose."""
+        with self.lock:
+            exclude = rejections.exclusion(problem, self.engine)
+            return exclude, self.engine.all_excluded(problem, exclude)
+
+    @contextmanager
+    def writing(self, expect=None):
+        with self.lock:
+            try:
+                with writing(self.engine, self.storage, expect):
+                    yield self.engine, self.storage
+            finally:
+                self.version += 1
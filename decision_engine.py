@@ -0,0 +1,772 @@
+import bisect
+import random
+from collections import Counter
+
+from decision_metrics import metrics
+from decision_model import Solution
+from decision_moods import MoodCatalog, MoodTrie, match_scores, normalize_match
+
+# --- Strategy Names ---
+# Every frontend spells its preferences a little differently, so they are all
+# folded onto one set of names before the engine sees them.
+STRATEGY_ALIASES = {
+    "default": "default", "random": "default", "rand": "default", "r": "default",
+    "ranking": "ranking", "rank": "ranking", "num": "ranking", "number": "ranking", "#": "ranking",
+    "mood": "mood", "context": "mood", "scenario": "mood", "circumstance": "mood",
+    "most": "most", "most chosen": "most",
+    "least": "least", "least chosen": "least",
+    "trendy": "trendy", "trend": "trendy",
+    "popular": "popular", "hot": "popular", "lately": "popular", "this week": "popular",
+    "history": "history", "previous": "history", "old": "history",
+    "weighted": "weighted", "proportional": "weighted",
+}
+TRENDY_WINDOW = 5
+POPULAR_DAYS = 7
+STATS_NAME_LIMIT = 10
+
+
+def normalize_strategy(name):
+    name = (name or "default").strip().lower()
+    if name in STRATEGY_ALIASES:
+        return STRATEGY_ALIASES[name]
+    return STRATEGY_ALIASES.get(name.split(" ")[0], "default")
+
+
+def _is_names(value):
+    return isinstance(value, (list, tuple)) and all(isinstance(name, str) for name in value)
+
+
+def _request_error(item):
+    # decide() requests come straight from JSON, so each field is checked
+    # before use and a bad one fails only its own item.
+    if not isinstance(item.get("problem"), str):
+        return "'problem' must be a string."
+    for field in ("strategy", "match"):
+        if item.get(field) is not None and not isinstance(item[field], str):
+            return f"'{field}' must be a string."
+    mood = item.get("mood")
+    if mood is not None and not isinstance(mood, str) and not _is_names(mood):
+        return "'mood' must be a string or a list of strings."
+    for field in ("exclude", "recent"):
+        if item.get(field) is not None and not _is_names(item[field]):
+            return f"'{field}' must be a list of strings."
+    days = item.get("days")
+    if days is not None and (isinstance(days, bool) or not isinstance(days, (int, float)) or not days > 0):
+        return "'days' must be a positive number."
+    return None
+
+
+# --- Solution Field Helpers ---
+# Older files written by decision_maker.py store ranks as strings (or []) and
+# moods as a single string, so reads go through these instead of the raw dict.
+# A Solution (see decision_model.py) has them parsed already.
+def solution_rank(sol):
+    if type(sol) is Solution:
+        return sol.rank
+    rank = sol.get("ranking", 0)
+    if isinstance(rank, str):
+        try:
+            return int(rank)
+        except ValueError:
+            return 0
+    if isinstance(rank, (int, float)):
+        return int(rank)
+    return 0
+
+
+def solution_moods(sol):
+    if type(sol) is Solution:
+        return sol.moods
+    moods = sol.get("mood", [])
+    if isinstance(moods, str):
+        moods = moods.split(",")
+    return [m.strip().lower() for m in moods if m and m.strip()]
+
+
+def solution_history(sol):
+    if type(sol) is Solution:
+        return sol.history
+    return sol.get("history", 0)
+
+
+def parse_moods(text):
+    return [m.strip().lower() for m in text.split(',') if m.strip()]
+
+
+def parse_rank(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def new_solution(name, ranking=0, moods=(), history=0):
+    return Solution(name, ranking, list(moods), history)
+
+
+# --- Index Structures ---
+class Bucket:
+    """Set of solutions supporting O(1) add, remove and uniform random choice."""
+
+    __slots__ = ("items", "positions")
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def add(self, sol):
+        if sol["solutions"] in self.positions:
+            return
+        self.positions[sol["solutions"]] = len(self.items)
+        self.items.append(sol)
+
+    def remove(self, name):
+        index = self.positions.pop(name, None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last["solutions"]] = index
+
+    def choice(self, exclude=None):
+        if not self.items:
+            return None
+        if not exclude:
+            return random.choice(self.items)
+        # A few blind draws are almost always enough; only scan when the
+        # exclusions cover most of the bucket.
+        for _ in range(8):
+            sol = random.choice(self.items)
+            if sol["solutions"] not in exclude:
+                return sol
+        eligible = [s for s in self.items if s["solutions"] not in exclude]
+        return random.choice(eligible) if eligible else None
+
+
+class SortedBuckets:
+    """Buckets keyed by an integer, with the distinct keys kept in sorted order."""
+
+    __slots__ = ("buckets", "keys")
+
+    def __init__(self):
+        self.buckets = {}
+        self.keys = []
+
+    def add(self, key, sol):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket()
+            bisect.insort(self.keys, key)
+        bucket.add(sol)
+
+    def remove(self, key, name):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        bucket.remove(name)
+        if not bucket:
+            del self.buckets[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def first(self, exclude=None, minimum=None):
+        start = 0 if minimum is None else bisect.bisect_left(self.keys, minimum)
+        for key in self.keys[start:]:
+            sol = self.buckets[key].choice(exclude)
+            if sol is not None:
+                return key, sol
+        return None, None
+
+    def last(self, exclude=None, minimum=None):
+        stop = 0 if minimum is None else bisect.bisect_left(self.keys, minimum)
+        for key in reversed(self.keys[stop:]):
+            sol = self.buckets[key].choice(exclude)
+            if sol is not None:
+                return key, sol
+        return None, None
+
+
+# --- History Sampling ---
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    __slots__ = ("items", "prob", "alias", "total")
+
+    def __init__(self, items, weights):
+        self.items = items
+        self.total = sum(weights)
+        n = len(items)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        if n == 0 or self.total <= 0:
+            return
+        scaled = [w * n / self.total for w in weights]
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self):
+        i = random.randrange(len(self.items))
+        return self.items[i] if random.random() < self.prob[i] else self.items[self.alias[i]]
+
+
+class HistorySampler:
+    """History-proportional draws from an alias table plus the accepts made since it was built.
+
+    Each accept adds one entry to ``deltas`` instead of rebuilding the table,
+    so drawing from the table with probability total/(total+len(deltas)) and
+    otherwise from ``deltas`` stays exactly proportional to current history.
+    The table is rebuilt once the deltas outgrow it, keeping accepts O(1)
+    amortised.
+    """
+
+    __slots__ = ("table", "deltas")
+
+    def __init__(self, solutions):
+        weighted = [s for s in solutions if solution_history(s) > 0]
+        self.table = AliasTable(weighted, [solution_history(s) for s in weighted])
+        self.deltas = []
+
+    @property
+    def stale(self):
+        return len(self.deltas) > max(16, len(self.table.items))
+
+    @property
+    def total(self):
+        return self.table.total + len(self.deltas)
+
+    def add_delta(self, sol):
+        self.deltas.append(sol)
+
+    def draw(self, exclude=None):
+        if self.total <= 0:
+            return None
+        for _ in range(16):
+            if random.random() * self.total < self.table.total:
+                sol = self.table.draw()
+            else:
+                sol = random.choice(self.deltas)
+            if not exclude or sol["solutions"] not in exclude:
+                return sol
+        eligible = [s for s in self.table.items if s["solutions"] not in exclude]
+        eligible += [s for s in self.deltas if s["solutions"] not in exclude and s not in eligible]
+        if not eligible:
+            return None
+        return random.choices(eligible, weights=[solution_history(s) for s in eligible])[0]
+
+
+class ExclusionMask:
+    """Excluded solutions as a bitset over a ProblemIndex's solution ids.
+
+    Works anywhere a set of excluded names does (``name in mask``), while
+    whole-problem checks such as "is everything excluded?" are one bitwise
+    operation instead of a pass over the solutions.
+    """
+
+    __slots__ = ("index", "bits")
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = bits
+
+    def __contains__(self, name):
+        bit = self.index.ids.get(name)
+        return bit is not None and (self.bits >> bit) & 1 == 1
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def eligible_bits(self):
+        return self.index.full_mask & ~self.bits
+
+
+class ProblemIndex:
+    """Rank buckets, history order and a mood->solutions index for one problem."""
+
+    def __init__(self, solutions):
+        self.solutions = solutions
+        self.by_name = {}
+        self.all = Bucket()
+        self.ranks = SortedBuckets()
+        self.history = SortedBuckets()
+        self.moods = {}
+        self.mood_trie = MoodTrie()
+        self.total_history = 0
+        self._sampler = None
+        # Bit positions for exclusion masks. A solution keeps its bit for the
+        # life of the index, so edits and accepts never invalidate a mask.
+        self.ids = {}
+        self.full_mask = 0
+        for sol in solutions:
+            self.add(sol)
+
+    def __len__(self):
+        return len(self.all)
+
+    def add(self, sol):
+        name = sol["solutions"]
+        self._sampler = None
+        self.by_name[name] = sol
+        if name not in self.ids:
+            self.ids[name] = len(self.ids)
+        self.full_mask |= 1 << self.ids[name]
+        self.all.add(sol)
+        rank = solution_rank(sol)
+        if rank > 0:
+            self.ranks.add(rank, sol)
+        history = solution_history(sol)
+        self.history.add(history, sol)
+        self.total_history += history
+        for mood in solution_moods(sol):
+            bucket = self.moods.get(mood)
+            if bucket is None:
+                bucket = self.moods[mood] = Bucket()
+                self.mood_trie.add(mood)
+            bucket.add(sol)
+
+    def remove(self, name):
+        sol = self.by_name.pop(name, None)
+        if sol is None:
+            return None
+        self._sampler = None
+        self.full_mask &= ~(1 << self.ids[name])
+        self.all.remove(name)
+        rank = solution_rank(sol)
+        if rank > 0:
+            self.ranks.remove(rank, name)
+        history = solution_history(sol)
+        self.history.remove(history, name)
+        self.total_history -= history
+        for mood in solution_moods(sol):
+            bucket = self.moods.get(mood)
+            if bucket is not None:
+                bucket.remove(name)
+                if not bucket:
+                    del self.moods[mood]
+                    self.mood_trie.discard(mood)
+        return sol
+
+    def sampler(self):
+        if self._sampler is None or self._sampler.stale:
+            self._sampler = HistorySampler(self.solutions)
+        return self._sampler
+
+    def mask(self, names):
+        bits = 0
+        for name in names:
+            if name in self.ids:
+                bits |= 1 << self.ids[name]
+        return ExclusionMask(self, bits)
+
+    def count_excluded(self, exclude):
+        if not exclude:
+            return 0
+        if isinstance(exclude, ExclusionMask):
+            return sum(1 for name in self.by_name if name in exclude)
+        return sum(1 for name in exclude if name in self.by_name)
+
+
+def _tie_set(bucket, times, limit):
+    return {"names": [s["solutions"] for s in bucket.items[:limit]], "count": len(bucket), "times": times}
+
+
+def format_tie_set(tie):
+    text = ", ".join(tie["names"])
+    if tie["count"] > len(tie["names"]):
+        text += f" and {tie['count'] - len(tie['names'])} more"
+    return f"{text} ({tie['times']} times)"
+
+
+def format_rank_histogram(stats):
+    parts = [f"#{rank}: {count}" for rank, count in stats["ranks"].items()]
+    if stats["unranked"]:
+        parts.append(f"unranked: {stats['unranked']}")
+    return ", ".join(parts) if parts else "None"
+
+
+# --- Engine ---
+class DecisionEngine:
+    def __init__(self, decisions, max_indexes=None):
+        self.decisions = decisions
+        self.max_indexes = max_indexes
+        self._indexes = {}
+        self._catalog = None
+        # Every change stamps its problem with the next value of one counter,
+        # so a problem's version only ever goes up, even across a delete and
+        # re-add. ``epoch`` tells this engine's versions apart from those of
+        # an earlier process or reload.
+        self.epoch = f"{random.getrandbits(32):08x}"
+        self.generation = 0
+        self.versions = {}
+        self._names = None
+
+    def index(self, problem):
+        # Past max_indexes (by default the capacity of lazily loaded
+        # decisions, so an index never outlives the list it was built on)
+        # the least recently used index is dropped and rebuilt on demand.
+        index = self._indexes.pop(problem, None)
+        if index is None or index.solutions is not self.decisions.get(problem):
+            index = ProblemIndex(self.decisions.get(problem, []))
+        self._indexes[problem] = index
+        limit = self.max_indexes or getattr(self.decisions, "capacity", None)
+        if limit and len(self._indexes) > limit:
+            del self._indexes[next(iter(self._indexes))]
+        return index
+
+    def invalidate(self, problem=None):
+        if problem is None:
+            self._indexes.clear()
+            self.epoch = f"{random.getrandbits(32):08x}"
+            self.versions = {}
+            self._names = None
+        else:
+            self._indexes.pop(problem, None)
+            self._touch(problem)
+            if self._names is not None:
+                # Another process may have added or deleted the problem.
+                i = bisect.bisect_left(self._names, problem)
+                if (i < len(self._names) and self._names[i] == problem) != (problem in self.decisions):
+                    self._names = None
+        self._catalog = None
+
+    # --- Versions ---
+    def _touch(self, problem):
+        self.generation += 1
+        self.versions[problem] = self.generation
+
+    def version(self, problem):
+        """The engine-wide change counter as of ``problem``'s last change; 0 if unchanged since load."""
+        return self.versions.get(problem, 0)
+
+    def problem_page(self, after=None, limit=100):
+        """Return ``([(problem, version)], next_cursor)`` for up to ``limit`` problems sorted after ``after``."""
+        if self._names is None:
+            self._names = sorted(self.decisions)
+        start = 0 if after is None else bisect.bisect_right(self._names, after)
+        names = self._names[start:start + limit]
+        more = start + limit < len(self._names)
+        return [(name, self.versions.get(name, 0)) for name in names], (names[-1] if more and names else None)
+
+    def mood_catalog(self):
+        """The MoodCatalog over every problem, built on first use and kept up to date by the mutations below."""
+        if self._catalog is None:
+            catalog = MoodCatalog()
+            for problem in self.decisions:
+                for mood, bucket in self.index(problem).moods.items():
+                    catalog.add(problem, (mood,), len(bucket))
+            self._catalog = catalog
+        return self._catalog
+
+    # Mutations keep the decisions dict and the indexes in step.
+    def add_problem(self, problem):
+        if problem in self.decisions:
+            return False
+        self.decisions[problem] = []
+        self._names = None
+        self._touch(problem)
+        return True
+
+    def delete_problem(self, problem):
+        if problem not in self.decisions:
+            return False
+        if self._catalog is not None:
+            self._catalog.drop_problem(problem, list(self.index(problem).moods))
+        self._indexes.pop(problem, None)
+        self._names = None
+        self._touch(problem)
+        del self.decisions[problem]
+        return True
+
+    def has_solution(self, problem, name):
+        return problem in self.decisions and name in self.index(problem).by_name
+
+    def get_solution(self, problem, name):
+        return self.index(problem).by_name.get(name)
+
+    def edit_base(self, problem, name):
+        """The ``(rank, moods)`` an edit of ``name`` starts from, or None once it is gone."""
+        sol = self.index(problem).by_name.get(name) if problem in self.decisions else None
+        return None if sol is None else (solution_rank(sol), tuple(solution_moods(sol)))
+
+    def add_solution(self, problem, name, ranking=0, moods=(), history=0):
+        if problem not in self.decisions:
+            self.decisions[problem] = []
+            self._names = None
+        index = self.index(problem)
+        if name in index.by_name:
+            return None
+        sol = new_solution(name, ranking, moods, history)
+        self.decisions[problem].append(sol)
+        index.add(sol)
+        self._touch(problem)
+        if self._catalog is not None:
+            self._catalog.add(problem, solution_moods(sol))
+        return sol
+
+    def delete_solution(self, problem, name):
+        index = self.index(problem)
+        sol = index.remove(name)
+        if sol is not None:
+            self.decisions[problem].remove(sol)
+            self._touch(problem)
+            if self._catalog is not None:
+                self._catalog.remove(problem, solution_moods(sol))
+        return sol
+
+    def update_solution(self, problem, name, ranking=None, moods=None):
+        index = self.index(problem)
+        sol = index.remove(name)
+        if sol is None:
+            return None
+        old_moods = solution_moods(sol)
+        if ranking is not None:
+            sol["ranking"] = ranking
+        if moods is not None:
+            sol["mood"] = list(moods)
+        index.add(sol)
+        self._touch(problem)
+        if self._catalog is not None and moods is not None:
+            self._catalog.remove(problem, old_moods)
+            self._catalog.add(problem, solution_moods(sol))
+        return sol
+
+    def set_solutions(self, problem, solutions):
+        """Replace ``problem``'s whole solution list (adding the problem if needed); its index is rebuilt on next use."""
+        if problem not in self.decisions:
+            self._names = None
+        self.decisions[problem] = solutions
+        self.invalidate(problem)
+
+    def apply_edits(self, problem, edits):
+        """Apply ``{name: {"ranking", "mood"}}`` form edits; return only the solutions that really changed."""
+        index = self.index(problem)
+        changed = []
+        for name, edit in edits.items():
+            sol = index.by_name.get(name)
+            if sol is None:
+                continue
+            ranking = parse_rank(edit.get("ranking"))
+            moods = parse_moods(edit.get("mood", ""))
+            if ranking == solution_rank(sol) and moods == list(solution_moods(sol)):
+                continue
+            changed.append(self.update_solution(problem, name, ranking=ranking, moods=moods))
+        return changed
+
+    def record_accept(self, problem, name):
+        index = self.index(problem)
+        sampler = index._sampler
+        sol = index.remove(name)
+        if sol is None:
+            return None
+        sol["history"] = solution_history(sol) + 1
+        index.add(sol)
+        self._touch(problem)
+        if sampler is not None:
+            index._sampler = sampler
+            sampler.add_delta(sol)
+        return sol
+
+    # --- Statistics ---
+    # Everything below reads the aggregates the index already maintains on each
+    # add, delete and accept, so rendering stats never walks the solutions.
+    def stats(self, problem, limit=STATS_NAME_LIMIT, timeline=None):
+        """Counts, most/least chosen and rank histogram; with ``timeline`` also the week's most chosen."""
+        with metrics.timer("decision_stats_seconds"):
+            stats = self._stats(problem, limit)
+            if timeline is not None:
+                stats["popular"] = self._popular_stats(problem, timeline, limit)
+            return stats
+
+    def _stats(self, problem, limit):
+        index = self.index(problem)
+        history = index.history
+        stats = {"count": len(index), "most_chosen": None, "least_chosen": None,
+                 "ranks": {rank: len(index.ranks.buckets[rank]) for rank in index.ranks.keys}}
+        stats["unranked"] = stats["count"] - sum(stats["ranks"].values())
+        if history.keys and history.keys[-1] > 0:
+            stats["most_chosen"] = _tie_set(history.buckets[history.keys[-1]], history.keys[-1], limit)
+        if history.keys:
+            stats["least_chosen"] = _tie_set(history.buckets[history.keys[0]], history.keys[0], limit)
+        return stats
+
+    def _popular_stats(self, problem, timeline, limit):
+        # Read from the timeline's rollups rather than the index, so this is a
+        # sum over a few dozen buckets however many accepts the week had.
+        by_name = self.index(problem).by_name
+        top, names = timeline.most_chosen(problem, POPULAR_DAYS, by_name.__contains__)
+        if not names:
+            return None
+        return {"names": names[:limit], "count": len(names), "times": top}
+
+    # --- Selection ---
+    def all_excluded(self, problem, exclude):
+        index = self.index(problem)
+        if len(index) == 0 or not exclude:
+            return False
+        with metrics.timer("decision_eligibility_seconds"):
+            if isinstance(exclude, ExclusionMask) and exclude.index is index:
+                return exclude.eligible_bits() == 0
+            return index.count_excluded(exclude) >= len(index)
+
+    def choose(self, problem, strategy="default", mood=None, exclude=None, recent=None, trends=None, match="best",
+               timeline=None, days=POPULAR_DAYS):
+        """Return ``(solution, reason)``; ``solution`` is None when the strategy finds no match.
+
+        ``mood`` may list several comma-separated moods; ``match`` is "any",
+        "all" or "best" (most of them). ``trendy`` follows ``trends`` (a
+        TrendTracker) when given, otherwise the plain list of recently
+        accepted names in ``recent``. ``popular`` picks the most accepted
+        solution of the last ``days`` days from ``timeline`` (an
+        AcceptTimeline).
+        """
+        strategy = normalize_strategy(strategy)
+        if not metrics.enabled:
+            return self._choose(problem, strategy, mood, exclude, recent, trends, match, timeline, days)
+        with metrics.timer("decision_choose_seconds", strategy=strategy):
+            sol, reason = self._choose(problem, strategy, mood, exclude, recent, trends, match, timeline, days)
+        metrics.count("decision_choices_total", strategy=strategy, outcome="none" if sol is None else "chosen")
+        return sol, reason
+
+    def _choose(self, problem, strategy, mood, exclude, recent, trends, match, timeline, days):
+        index = self.index(problem)
+        if strategy == "ranking":
+            rank, sol = index.ranks.first(exclude)
+            if sol is not None:
+                return sol, f"Chosen for its top rank of {rank}."
+            return None, "No solutions have been ranked yet."
+        if strategy == "mood":
+            return self._choose_by_moods(index, mood, match, exclude)
+        if strategy == "most":
+            history, sol = index.history.last(exclude, minimum=1)
+            if sol is not None:
+                return sol, f"Chosen for being the most popular ({history} times)."
+            return None, "No solution has been chosen yet."
+        if strategy == "least":
+            history, sol = index.history.first(exclude)
+            if sol is not None:
+                return sol, f"Chosen for being picked least often ({history} times)."
+            return None, "This problem has no solutions."
+        if strategy == "trendy":
+            if trends is not None:
+                leaders = [trends.leader(problem)]
+            else:
+                leaders = [name for name, _ in Counter((recent or [])[-TRENDY_WINDOW:]).most_common(1)]
+            for name in leaders:
+                if name in index.by_name and not (exclude and name in exclude):
+                    return index.by_name[name], "Chosen for being trendy recently."
+            return None, "No recent decisions to follow."
+        if strategy == "popular":
+            return self._choose_popular(problem, index, timeline, days, exclude)
+        if strategy == "history":
+            return self._choose_above_average(index, exclude)
+        if strategy == "weighted":
+            sol = index.sampler().draw(exclude)
+            if sol is not None:
+                return sol, f"Chosen in proportion to its history ({sol['history']} times)."
+            return None, "No solution has been chosen yet."
+        sol = index.all.choice(exclude)
+        if sol is not None:
+            return sol, "Chosen at random."
+        return None, "This problem has no solutions."
+
+    def decide(self, item, trends=None, timeline=None):
+        """Answer one ``{problem, strategy, mood, match, exclude, recent, days}`` request without side effects.
+
+        ``mood`` may be a string or a list of moods. A malformed item gets an
+        ``error`` in its result instead of raising.
+        """
+        problem = item.get("problem")
+        error = _request_error(item)
+        if error is not None:
+            return {"problem": problem, "strategy": item.get("strategy"), "solution": None, "error": error}
+        strategy = normalize_strategy(item.get("strategy"))
+        result = {"problem": problem, "strategy": strategy, "solution": None}
+        if problem not in self.decisions:
+            result["error"] = f"Unknown problem '{problem}'."
+            return result
+        exclude = set(item.get("exclude") or ())
+        mood = item.get("mood")
+        if isinstance(mood, (list, tuple)):
+            mood = ", ".join(mood)
+        if "recent" in item:
+            trends = None
+        sol, reason = self.choose(problem, strategy, mood=mood, exclude=exclude,
+                                  recent=item.get("recent"), trends=trends, match=item.get("match"),
+                                  timeline=timeline, days=item.get("days") or POPULAR_DAYS)
+        if sol is None and strategy not in ("mood", "history"):
+            sol, reason = self.choose(problem, "default", exclude=exclude)
+        result["reason"] = reason
+        if sol is not None:
+            result["solution"] = sol["solutions"]
+        return result
+
+    def _choose_popular(self, problem, index, timeline, days, exclude):
+        top, names = (0, []) if timeline is None else timeline.most_chosen(
+            problem, days, lambda name: name in index.by_name and not (exclude and name in exclude))
+        if not names:
+            return None, f"Nothing was chosen in the last {days:g} days."
+        return index.by_name[random.choice(names)], f"Chosen most often in the last {days:g} days ({top} times)."
+
+    def _choose_by_moods(self, index, text, match, exclude):
+        # Each query word is resolved through the mood trie, then only the
+        # buckets of the resolved moods are walked to score solutions by how
+        # many of the words they match.
+        text = (text or "").strip().lower()
+        terms = parse_moods(text)
+        if len(terms) == 1 and terms[0] in index.moods:
+            sol = index.moods[terms[0]].choice(exclude)
+            if sol is not None:
+                return sol, f"Chosen for matching the mood '{terms[0]}'."
+            return None, f"No solutions found for the mood '{text}'."
+        groups = [index.mood_trie.expand(term) for term in terms]
+        scores, by_name = {}, {}
+        for group in groups:
+            members = {}
+            for mood in group:
+                members.update((sol["solutions"], sol) for sol in index.moods[mood].items)
+            for name, sol in members.items():
+                if not (exclude and name in exclude):
+                    scores[name] = scores.get(name, 0) + 1
+                    by_name[name] = sol
+        matches = match_scores(scores, len(groups), normalize_match(match))
+        if not matches:
+            return None, f"No solutions found for the mood '{text}'."
+        sol = by_name[random.choice(list(matches))]
+        matched = [mood for group in groups for mood in group if mood in solution_moods(sol)]
+        quoted = ", ".join(f"'{mood}'" for mood in dict.fromkeys(matched))
+        return sol, f"Chosen for matching the mood{'s' if len(matched) > 1 else ''} {quoted}."
+
+    def find_problems(self, moods, match="any"):
+        """Return ``[(problem, words matched)]`` for problems using the comma-separated ``moods``."""
+        return self.mood_catalog().find(parse_moods(moods or ""), match)
+
+    def suggest_moods(self, text, problem=None, limit=10):
+        """Moods (of one problem, or of all of them) that ``text`` is a prefix or near miss of."""
+        trie = self.index(problem).mood_trie if problem is not None else self.mood_catalog().trie
+        return trie.expand((text or "").strip().lower())[:limit]
+
+    def _choose_above_average(self, index, exclude):
+        # Picks uniformly among solutions whose share of the history is at
+        # least an even split, walking only the distinct history values.
+        if index.total_history == 0 or len(index) == 0:
+            return None, "No history has been recorded for this problem."
+        threshold = -(-index.total_history // len(index))
+        keys = index.history.keys[bisect.bisect_left(index.history.keys, threshold):]
+        weights = [len(index.history.buckets[key]) for key in keys]
+        while keys:
+            i = random.choices(range(len(keys)), weights=weights)[0]
+            sol = index.history.buckets[keys[i]].choice(exclude)
+            if sol is not None:
+                return sol, "Chosen for being favoured in your history."
+            del keys[i], weights[i]
+        return None, "No single solution has been favored over the others."
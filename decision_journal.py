@@ -0,0 +1,812 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are kept apart.
+    fcntl = None
+
+from decision_metrics import metrics
+from decision_model import compact_solution, compact_solutions, solution_to_json
+
+# --- Journal Format ---
+# decisions.json stays the snapshot every frontend already understands. Changes
+# since the last snapshot live in "<snapshot>.journal", one JSON record per
+# line. Records carry absolute values (the whole solution after the change,
+# not "+1"), so replaying a journal over a snapshot that already contains some
+# of it gives the same result. That is what makes compaction crash-safe: the
+# snapshot is replaced atomically first, and the journal is only replaced
+# afterwards.
+COMPACT_EVERY = 1000
+
+# --- Concurrent Writers ---
+# Several processes may share one snapshot and journal. Every write happens
+# under an exclusive lock on "<snapshot>.lock", and first replays whatever
+# other processes appended since we last looked, so a record is always
+# written on top of the latest state. Each record carries its problem's new
+# version ("v"), which gives every problem a version number all processes
+# agree on. Compaction keeps those versions as "version" records at the start
+# of the new journal, and replaces the journal file rather than truncating
+# it, which is how the other processes notice they have to reload.
+
+# --- Offset Index ---
+# "<snapshot>.index" records where each problem's solution list starts in the
+# snapshot and how many bytes it takes, stamped with the snapshot's mtime and
+# size. A lazy load reads only that index and parses a problem the first time
+# it is used. Snapshots we write produce their index as they go; a snapshot
+# written by anything else is scanned once to rebuild it. Lazy reads go
+# through an open handle on the snapshot those offsets came from, so a
+# snapshot another process compacts into place is never read with our old
+# offsets; catching up moves us onto the new one. ``view_lock`` guards that
+# handle, the offsets and the journal overlay: lazy loads hold it, and
+# writers take it only to swap in what they have already read or written.
+CACHE_SIZE = 256
+COMPACT_SLACK = 1000  # records a shared log may hold past twice its live ones
+_WHITESPACE = re.compile(r"\s*")
+# json.dumps builds a new encoder per call whenever it gets options; a journal
+# write can encode hundreds of thousands of records, so these are built once.
+_SNAPSHOT_ENCODER = json.JSONEncoder(default=solution_to_json)
+_RECORD_ENCODER = json.JSONEncoder(separators=(",", ":"), default=solution_to_json)
+
+
+def apply_record(decisions, record, positions=None):
+    op = record.get("op")
+    problem = record.get("problem")
+    if positions is None:
+        positions = {}
+    if op == "add_problem":
+        decisions.setdefault(problem, [])
+    elif op == "delete_problem":
+        decisions.pop(problem, None)
+        positions.pop(problem, None)
+    elif op == "put_solution":
+        if not isinstance(record.get("solution"), Mapping):
+            return  # A record with no solution (written by an older bug) changes nothing.
+        sol = compact_solution(record["solution"])
+        solutions = decisions.setdefault(problem, [])
+        index = _positions(positions, problem, solutions)
+        if sol["solutions"] in index:
+            solutions[index[sol["solutions"]]] = sol
+        else:
+            index[sol["solutions"]] = len(solutions)
+            solutions.append(sol)
+    elif op == "delete_solution":
+        solutions = decisions.get(problem, [])
+        decisions[problem] = [s for s in solutions if s["solutions"] != record["solution"]]
+        positions.pop(problem, None)
+
+
+class VersionConflict(Exception):
+    """Solutions an edit changes were re-ranked or re-tagged by another writer since the edit started."""
+
+    def __init__(self, problem, names):
+        super().__init__(f"'{problem}' was changed elsewhere ({', '.join(map(repr, names))}).")
+        self.problem = problem
+        self.names = names
+
+
+def _put_record(problem, sol):
+    if not isinstance(sol, Mapping):
+        raise ValueError(f"Cannot save {sol!r} as a solution of '{problem}'.")
+    return {"op": "put_solution", "problem": problem, "solution": sol}
+
+
+def _positions(positions, problem, solutions):
+    index = positions.get(problem)
+    if index is None:
+        index = positions[problem] = {s["solutions"]: i for i, s in enumerate(solutions)}
+    return index
+
+
+def _encode(value):
+    return _SNAPSHOT_ENCODER.encode(value).encode()
+
+
+def write_snapshot(decisions, filepath):
+    return write_snapshot_parts(((problem, _encode(solutions)) for problem, solutions in decisions.items()), filepath)
+
+
+def write_snapshot_parts(parts, filepath):
+    """Atomically write ``(problem, encoded solutions)`` pairs as the snapshot, plus its offset index."""
+    tmp_path, offsets = _write_snapshot_tmp(parts, filepath)
+    os.replace(tmp_path, filepath)
+    write_offsets(filepath, offsets)
+    return offsets
+
+
+def _write_snapshot_tmp(parts, filepath):
+    tmp_path = filepath + ".tmp"
+    offsets, position = {}, 0
+    with open(tmp_path, 'wb') as f:
+        for problem, encoded in parts:
+            prefix = (b"{" if position == 0 else b", ") + _encode(problem) + b": "
+            f.write(prefix + encoded)
+            offsets[problem] = (position + len(prefix), len(encoded))
+            position += len(prefix) + len(encoded)
+        f.write(b"}" if position else b"{}")
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path, offsets
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+    except FileNotFoundError:
+        return None
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _file_id(stat):
+    return None if stat is None else (stat.st_dev, stat.st_ino)
+
+
+def _count_changes(records):
+    return sum(record.get("op") != "version" for record, _ in records)
+
+
+def write_offsets(filepath, offsets):
+    tmp_path = filepath + ".index.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"stamp": _file_stamp(filepath),
+                   "problems": [[problem, offset, length] for problem, (offset, length) in offsets.items()]}, f)
+    os.replace(tmp_path, filepath + ".index")
+
+
+def read_offsets(filepath):
+    """Return ``{problem: (offset, length)}`` for the snapshot, rebuilding a missing or stale index."""
+    stamp = _file_stamp(filepath)
+    if stamp is None or stamp[1] == 0:
+        return {}
+    try:
+        with open(filepath + ".index", 'r') as f:
+            index = json.load(f)
+        if index["stamp"] == stamp:
+            return {problem: (offset, length) for problem, offset, length in index["problems"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    offsets = scan_offsets(filepath)
+    write_offsets(filepath, offsets)
+    return offsets
+
+
+def scan_offsets(filepath):
+    # One full pass over a snapshot that came without a usable index.
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    decoder = json.JSONDecoder()
+    pos = _WHITESPACE.match(text, 0).end()
+    if text[pos:pos + 1] != "{":
+        decoder.decode(text)
+        return {}
+    offsets = {}
+    byte_pos, char_pos = 0, 0
+
+    def to_bytes(i):
+        nonlocal byte_pos, char_pos
+        byte_pos += len(text[char_pos:i].encode())
+        char_pos = i
+        return byte_pos
+
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    while text[pos:pos + 1] != "}":
+        problem, pos = decoder.raw_decode(text, pos)
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        pos = _WHITESPACE.match(text, pos + 1).end()
+        _, end = decoder.raw_decode(text, pos)
+        start = to_bytes(pos)
+        offsets[problem] = (start, to_bytes(end) - start)
+        pos = _WHITESPACE.match(text, end).end()
+        if text[pos:pos + 1] == ",":
+            pos = _WHITESPACE.match(text, pos + 1).end()
+        elif text[pos:pos + 1] != "}":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+    return offsets
+
+
+class LazyDecisions(MutableMapping):
+    """Decisions mapping that reads a problem's solutions the first time it is used.
+
+    At most ``capacity`` problems stay parsed; the least recently used one is
+    dropped and read again from ``storage`` if it is needed later.
+    """
+
+    def __init__(self, storage, capacity=CACHE_SIZE):
+        self.storage = storage
+        self.capacity = capacity
+        self._names = dict.fromkeys(storage.list_problems())
+        self._loaded = OrderedDict()
+
+    def __getitem__(self, problem):
+        with self.storage.view_lock:
+            if problem not in self._names:
+                raise KeyError(problem)
+            solutions = self._loaded.get(problem)
+            if solutions is None:
+                solutions = self.storage.load_problem(problem)
+                self._cache(problem, solutions)
+            else:
+                self._loaded.move_to_end(problem)
+            return solutions
+
+    def _cache(self, problem, solutions):
+        self._loaded[problem] = solutions
+        self._loaded.move_to_end(problem)
+        if self.capacity and len(self._loaded) > self.capacity:
+            self._loaded.popitem(last=False)
+
+    def __setitem__(self, problem, solutions):
+        with self.storage.view_lock:
+            self._names[problem] = None
+            self._cache(problem, solutions)
+
+    def __delitem__(self, problem):
+        with self.storage.view_lock:
+            del self._names[problem]
+            self._loaded.pop(problem, None)
+
+    def __contains__(self, problem):
+        return problem in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class DecisionJournal:
+    """JSON snapshot plus journal. With ``lazy=True``, ``load()`` returns a
+    LazyDecisions that parses problems on demand through the offset index.
+    """
+
+    def __init__(self, path, compact_every=COMPACT_EVERY, sync=True, lazy=False, cache_size=CACHE_SIZE):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.sync = sync
+        self.lazy = lazy
+        self.cache_size = cache_size
+        self.decisions = {}
+        self.offsets = {}
+        self.overlay = {}
+        self.versions = {}
+        self.pending = 0
+        self._names = {}
+        self._file = None
+        self._snapshot = None
+        self._lock = threading.RLock()
+        self.view_lock = threading.RLock()
+        self._lock_file = None
+        self._depth = 0
+        self._journal_id = None
+        self._snapshot_id = None
+        self._journal_pos = 0
+        self._unreported = set()
+
+    def load(self):
+        with metrics.timer("decision_storage_seconds", backend="json", op="load"), self._locked(), self.view_lock:
+            self._unreported = set()
+            return self._load_lazy() if self.lazy else self._load()
+
+    def _load(self):
+        decisions = {}
+        self._snapshot_id = _file_id(_stat(self.path))
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                decisions = {problem: compact_solutions(solutions) for problem, solutions in data.items()}
+        positions = {}
+        self.versions = {}
+        records = self._journal_records()
+        for record, _ in records:
+            self._count_version(record)
+            apply_record(decisions, record, positions)
+        self.pending = _count_changes(records)
+        # Reloads keep the same dict, so an engine built on it stays attached.
+        self.decisions.clear()
+        self.decisions.update(decisions)
+        return self.decisions
+
+    def _load_lazy(self):
+        # Journal records are kept per problem (as their JSON lines) and
+        # replayed over the snapshot slice whenever that problem is parsed.
+        self._open_snapshot()
+        self.overlay = {}
+        self.versions = {}
+        names = dict.fromkeys(self.offsets)
+        records = self._journal_records()
+        for record, line in records:
+            problem, op = record.get("problem"), record.get("op")
+            self._count_version(record)
+            if op == "delete_problem":
+                names.pop(problem, None)
+            elif op != "version":
+                names[problem] = None
+            self._note(record, line)
+        self.pending = _count_changes(records)
+        self._names = names
+        if isinstance(self.decisions, LazyDecisions):
+            self.decisions._names = dict.fromkeys(names)
+            self.decisions._loaded.clear()
+        else:
+            self.decisions = LazyDecisions(self, self.cache_size)
+        return self.decisions
+
+    def _journal_records(self):
+        stat = _stat(self.journal_path)
+        self._journal_id = _file_id(stat)
+        self._journal_pos = 0
+        if stat is None:
+            return []
+        records, good_bytes = [], 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                # A crash mid-append leaves at most one torn record at the end.
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                records.append((record, line))
+                good_bytes += len(line)
+        if good_bytes < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_bytes)
+        self._journal_pos = good_bytes
+        return records
+
+    def _note(self, record, line):
+        op, problem = record.get("op"), record.get("problem")
+        if op == "delete_problem":
+            self.overlay[problem] = [line]
+        elif op not in ("add_problem", "version"):
+            self.overlay.setdefault(problem, []).append(line)
+
+    def _count_version(self, record):
+        # Journals written before versions existed have no "v"; their
+        # records simply count up from zero.
+        problem = record.get("problem")
+        self.versions[problem] = record["v"] if "v" in record else self.versions.get(problem, 0) + 1
+
+    # --- Versions & Locking ---
+    def version(self, problem):
+        return self.versions.get(problem, 0)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._depth == 0 and fcntl is not None:
+                if self._lock_file is None:
+                    self._lock_file = open(self.path + ".lock", 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock; yields the problems other writers changed since we last looked.
+
+        Yields None instead when another process compacted in the meantime and
+        everything was reloaded.
+        """
+        with self._locked():
+            self.catch_up()
+            changed, self._unreported = self._unreported, set()
+            yield changed
+
+    def catch_up(self):
+        # Whatever is caught up here (including by writes outside a
+        # transaction) is reported by the next transaction().
+        with self._locked():
+            stat = _stat(self.journal_path)
+            journal_id = _file_id(stat)
+            # A compaction elsewhere replaces both files; the snapshot is
+            # checked too for when there was no journal to replace.
+            replaced = ((self._journal_id is not None and journal_id != self._journal_id)
+                        or _file_id(_stat(self.path)) != self._snapshot_id)
+            if replaced or (stat is not None and stat.st_size < self._journal_pos):
+                self._reload()
+                self._unreported = None
+                return None
+            changed = set()
+            if stat is None or stat.st_size == self._journal_pos:
+                return changed
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_pos)
+                data = f.read(stat.st_size - self._journal_pos)
+            positions, fresh = {}, set()
+            with self.view_lock:
+                for line in data.splitlines(keepends=True):
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    self._apply_foreign(record, line, positions, fresh)
+                    changed.add(record.get("problem"))
+                    self._journal_pos += len(line)
+                    self.pending += record.get("op") != "version"
+            self._journal_id = journal_id
+            if self._unreported is not None:
+                self._unreported |= changed
+            return changed
+
+    def _apply_foreign(self, record, line, positions, fresh):
+        self._count_version(record)
+        op, problem = record.get("op"), record.get("problem")
+        if isinstance(self.decisions, LazyDecisions):
+            self._note(record, line)
+            self.decisions._loaded.pop(problem, None)
+            if op == "delete_problem":
+                self._names.pop(problem, None)
+                self.decisions._names.pop(problem, None)
+            elif op != "version":
+                self._names[problem] = None
+                self.decisions._names[problem] = None
+            return
+        if problem in self.decisions and problem not in fresh:
+            # A new list, so engines holding an index over the old one rebuild it.
+            self.decisions[problem] = list(self.decisions[problem])
+            fresh.add(problem)
+        apply_record(self.decisions, record, positions)
+
+    def _reload(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with self.view_lock:
+            self._load_lazy() if self.lazy else self._load()
+
+    # --- Lazy Access ---
+    def list_problems(self):
+        return list(self._names)
+
+    def load_problem(self, problem):
+        with self.view_lock:
+            decisions = {}
+            if problem in self.offsets:
+                decisions[problem] = compact_solutions(json.loads(self._read_span(*self.offsets[problem])))
+            positions = {}
+            for line in self.overlay.get(problem, ()):
+                apply_record(decisions, json.loads(line), positions)
+        return decisions.get(problem, [])
+
+    def _read_span(self, offset, length):
+        with self.view_lock:
+            self._snapshot.seek(offset)
+            return self._snapshot.read(length)
+
+    def _open_snapshot(self, offsets=None):
+        # The offsets must describe the file behind the handle, so they are
+        # read again if the snapshot was replaced while we looked.
+        while True:
+            try:
+                f = open(self.path, 'rb')
+            except FileNotFoundError:
+                f, offsets = None, {}
+                break
+            if offsets is not None:
+                break
+            try:
+                offsets = read_offsets(self.path)
+            except BaseException:
+                f.close()
+                raise
+            if _file_id(os.fstat(f.fileno())) == _file_id(_stat(self.path)):
+                break
+            f.close()
+            offsets = None
+        self._close_snapshot()
+        self._snapshot, self.offsets = f, offsets
+        self._snapshot_id = None if f is None else _file_id(os.fstat(f.fileno()))
+
+    def _close_snapshot(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+
+    # --- Change Records ---
+    def add_problem(self, problem):
+        self.append({"op": "add_problem", "problem": problem})
+
+    def delete_problem(self, problem):
+        self.append({"op": "delete_problem", "problem": problem})
+
+    def put_solution(self, problem, sol):
+        self.append(_put_record(problem, sol))
+
+    def put_solutions(self, problem, sols):
+        self.append(*(_put_record(problem, sol) for sol in sols))
+
+    def put_batch(self, changes):
+        self.append(*(_put_record(problem, sol) for problem, sol in changes))
+
+    def delete_solution(self, problem, name):
+        self.append({"op": "delete_solution", "problem": problem, "solution": name})
+
+    def append(self, *records):
+        if not records:
+            return
+        with self._locked():
+            self.catch_up()
+            with metrics.timer("decision_storage_seconds", backend="json", op="save"):
+                self._write(records)
+            self.pending += len(records)
+            if self.compact_every and self.pending >= self.compact_every:
+                self.compact()
+
+    def _write(self, records):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a')
+        for record in records:
+            record["v"] = self.versions[record["problem"]] = self.version(record["problem"]) + 1
+        lines = [_RECORD_ENCODER.encode(record) + "\n" for record in records]
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        stat = os.fstat(self._file.fileno())
+        self._journal_id, self._journal_pos = _file_id(stat), stat.st_size
+        if isinstance(self.decisions, LazyDecisions):
+            with self.view_lock:
+                for record, line in zip(records, lines):
+                    self._note(record, line)
+
+    def compact(self):
+        with self._locked():
+            self.catch_up()
+            with metrics.timer("decision_storage_seconds", backend="json", op="compact"):
+                if isinstance(self.decisions, LazyDecisions):
+                    tmp_path, offsets = _write_snapshot_tmp(self._snapshot_parts(), self.path)
+                    with self.view_lock:
+                        # Closed first: Windows cannot replace a file that is open.
+                        self._close_snapshot()
+                        os.replace(tmp_path, self.path)
+                        self._open_snapshot(offsets)
+                        self.overlay = {}
+                    write_offsets(self.path, offsets)
+                else:
+                    write_snapshot(self.decisions, self.path)
+                    self._snapshot_id = _file_id(_stat(self.path))
+                self._replace_journal()
+            self.pending = 0
+
+    def _replace_journal(self):
+        # The new journal starts with each problem's version, and goes in
+        # under a new inode so other processes can tell it was compacted.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("".join(_RECORD_ENCODER.encode({"op": "version", "problem": problem, "v": version}) + "\n"
+                            for problem, version in self.versions.items()))
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        stat = _stat(self.journal_path)
+        self._journal_id, self._journal_pos = _file_id(stat), stat.st_size
+
+    def _snapshot_parts(self):
+        # Only problems with journal records (or none in the old snapshot)
+        # are re-encoded; every other problem is copied from the old snapshot
+        # byte for byte, parsed or not.
+        loaded = self.decisions._loaded
+        for problem in list(self.decisions):
+            if problem in self.overlay or problem not in self.offsets:
+                solutions = loaded.get(problem)
+                yield problem, _encode(self.load_problem(problem) if solutions is None else solutions)
+            else:
+                yield problem, self._read_span(*self.offsets[problem])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self._close_snapshot()
+
+
+# --- Shared Append Logs ---
+# The trend, timeline and rejection logs are JSONL files that every process
+# appends to and now and then rewrites with just the records that still
+# matter. AppendLog does that safely across processes, the same way the
+# journal does: appends and rewrites hold an exclusive lock on "<log>.lock"
+# and first read whatever other processes appended, so a rewrite never drops
+# their records, and a rewrite replaces the file, so everyone else sees a new
+# inode (or a shorter file) and rebuilds from the rewritten log instead of
+# appending to the old one. LoggedState wraps one for the modules that keep
+# state in such a log.
+class AppendLog:
+    """JSONL log shared between processes; ``apply(record)`` sees every record, ``reset()`` precedes a rebuild.
+
+    Callers serialize access between their own threads.
+    """
+
+    def __init__(self, path, apply, reset):
+        self.path = path
+        self.apply = apply
+        self.reset = reset
+        self.lines = 0
+        self._file = None
+        self._lock_file = None
+        self._id = None
+        self._pos = 0
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", 'a')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        self._id = None
+        self._catch_up()
+
+    def refresh(self):
+        """Read what other processes wrote since we last looked; return True if anything changed."""
+        stat = _stat(self.path)
+        if stat is not None and _file_id(stat) == self._id and stat.st_size == self._pos:
+            return False
+        return self._catch_up()
+
+    def _catch_up(self, repair=False):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            if self._id is None and self._pos == 0 and not self.lines:
+                return False
+            self._rebuild(None)
+            return True
+        with f:
+            stat = os.fstat(f.fileno())
+            changed = False
+            if _file_id(stat) != self._id or stat.st_size < self._pos:
+                self._rebuild(_file_id(stat))
+                changed = True
+            f.seek(self._pos)
+            for line in f.read(stat.st_size - self._pos).splitlines(keepends=True):
+                # A torn or garbled line ends the log; under the lock it is
+                # cut off so appends do not land behind it.
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.apply(record)
+                self.lines += 1
+                self._pos += len(line)
+                changed = True
+        if repair and self._pos < stat.st_size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._pos)
+        return changed
+
+    def _rebuild(self, file_id):
+        self.reset()
+        self.lines, self._pos, self._id = 0, 0, file_id
+        self._close_file()
+
+    def append(self, records):
+        """Append ``records`` after catching up, and apply them."""
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        if not lines:
+            return
+        with self._locked():
+            self._catch_up(repair=True)
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(lines)
+            self._file.flush()
+            stat = os.fstat(self._file.fileno())
+            self._id, self._pos = _file_id(stat), stat.st_size
+            for record in records:
+                self.apply(record)
+            self.lines += len(records)
+
+    def rewrite(self, snapshot):
+        """Replace the log with ``snapshot()``'s records, taken after catching up under the lock."""
+        with self._locked():
+            self._catch_up(repair=True)
+            records = snapshot()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            self._close_file()
+            os.replace(tmp_path, self.path)
+            stat = _stat(self.path)
+            self._id, self._pos = _file_id(stat), stat.st_size
+            self.lines = len(records)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._close_file()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class LoggedState:
+    """In-memory state rebuilt from an AppendLog and kept in step with it.
+
+    Subclasses set up their own fields before calling ``__init__`` and
+    define ``_reset()``, ``_apply(record)``, ``_records()`` (the records a
+    rewrite keeps) and ``_live()`` (how many that is); everything else,
+    including when to rewrite, lives here. ``self.lock`` serializes threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.log = AppendLog(path, self._apply, self._reset)
+        self.load()
+
+    def load(self):
+        with self.lock:
+            self.log.load()
+
+    def refresh(self):
+        """Read what other processes appended; return True if anything changed."""
+        with self.lock:
+            return self.log.refresh()
+
+    def _append(self, records):
+        # Callers hold self.lock. The log is rewritten once it holds more
+        # than twice the records still live, plus some slack.
+        self.log.append(records)
+        if self.log.lines > 2 * self._live() + COMPACT_SLACK:
+            self.log.rewrite(self._records)
+
+    def close(self):
+        self.log.close()
+
+
+class AcceptLog(LoggedState):
+    """A LoggedState fed one ``{problem, solution, time}`` record per accept."""
+
+    def record(self, problem, name, when=None):
+        self.record_many([(problem, name, when)])
+
+    def record_many(self, accepts):
+        """Record ``(problem, name, when)`` accepts with a single write to the log."""
+        records = [{"problem": problem, "solution": name, "time": time.time() if when is None else when}
+                   for problem, name, when in accepts]
+        with self.lock:
+            self._append(records)
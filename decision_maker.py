@@ -1,12 +1,28 @@
+import hashlib
 import json
 import os
-import random
 import textwrap
-from flask import Flask, request, render_template
+from flask import Flask, Response, jsonify, request, render_template
+from decision_engine import DecisionEngine
+from decision_metrics import metrics
+from decision_model import solution_to_json
+from decision_storage import STORAGE_ERRORS, open_storage, refresh, writing
+from decision_timeline import AcceptTimeline
+from decision_trends import TrendTracker
+from decision_watch import ChangeWatcher, storage_files
 
-DECISION_FILE = 'decisions.json'
+DECISION_FILE = os.environ.get('DECISION_FILE', 'decisions.json')
+
+MAX_BATCH = 1000
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 app = Flask(__name__)
+storage = open_storage(DECISION_FILE)
+trends = TrendTracker(DECISION_FILE + '.trends')
+timeline = AcceptTimeline(DECISION_FILE + '.timeline')
+watcher = ChangeWatcher(storage_files(DECISION_FILE))
+decisions, engine = None, None
 
 @app.route('/')
 def home_page():
@@ -17,14 +33,80 @@ def run_decision_maker():
 	decision = main()
 	return f"{decision}"
 
+@app.route('/decide', methods=['POST'])
+def decide():
+	items = request.get_json(silent=True)
+	if isinstance(items, dict) :
+		items = items.get('items')
+	if not isinstance(items, list) or not all(isinstance(item, dict) for item in items) :
+		return jsonify({"error": "Expected a JSON list of {problem, strategy, mood, match, exclude, days} items."}), 400
+	if len(items) > MAX_BATCH :
+		return jsonify({"error": f"At most {MAX_BATCH} items can be decided per request."}), 413
+	current = get_engine()
+	trends.refresh()
+	timeline.refresh()
+	return jsonify({"decisions": [current.decide(item, trends=trends, timeline=timeline) for item in items]})
+
+# Read API for dashboards. Each response carries a strong ETag built from the
+# per-problem versions kept by the storage, which every worker sharing the
+# file agrees on, and a matching If-None-Match gets a bare 304 before anything
+# is looked up or serialised.
+def conditional_json(tag, build):
+	if request.if_none_match.contains(tag) :
+		response = Response(status=304)
+	else :
+		response = Response(json.dumps(build(), default=solution_to_json), mimetype='application/json')
+	response.set_etag(tag)
+	response.headers['Cache-Control'] = 'no-cache'
+	return response
+
+@app.route('/problems')
+def list_problems():
+	limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+	current = get_engine()
+	names, cursor = current.problem_page(request.args.get('cursor'), limit)
+	page = [(problem, storage.version(problem)) for problem, _ in names]
+	digest = hashlib.blake2b(json.dumps([page, cursor]).encode(), digest_size=12).hexdigest()
+	return conditional_json(digest, lambda: {
+		"problems": [{"problem": problem, "version": version} for problem, version in page], "next": cursor})
+
+@app.route('/problems/<path:problem>')
+def problem_solutions(problem):
+	current = get_engine()
+	if problem not in current.decisions :
+		return jsonify({"error": f"Unknown problem '{problem}'."}), 404
+	version = storage.version(problem)
+	return conditional_json(f"v{version}", lambda: {
+		"problem": problem, "version": version, "solutions": current.decisions[problem]})
+
+@app.route('/metrics')
+def metrics_page():
+	# Prometheus scrape target; empty unless DECISION_METRICS=1 is set.
+	return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def get_engine():
+	global decisions, engine
+	if engine is None :
+		decisions = load_data()
+		engine = DecisionEngine(decisions)
+	elif watcher.changed() :
+		# Another process wrote: reload just the problems it changed, which
+		# also moves their versions (and so the read API's ETags) on.
+		try:
+			refresh(engine, storage)
+		except STORAGE_ERRORS :
+			pass
+	return engine
+
 def load_data():
-	if os.path.exists(DECISION_FILE):
-		with open(DECISION_FILE, 'r') as f:
-			list = json.load(f)
-			if isinstance(list, dict):
-				return list
+	return storage.load()
 
-	return {}
+def save_solution(problem, change):
+	# The change runs on top of whatever other processes saved meanwhile.
+	with writing(engine, storage):
+		solution = change()
+		if solution is not None :
+			storage.put_solution(problem, solution)
 
 def check_preferences(preferences):
 	while preferences != 'num' and preferences != 'history' and preferences != 'mood' and preferences != 'default' :
@@ -41,10 +123,9 @@ def check_preferences(preferences):
 	return preferences
 
 def add_problem(input):
-	if input not in decisions:
-		decisions[input] = []
-		with open(DECISION_FILE, 'w') as f:
-			json.dump(decisions, f)
+	with writing(engine, storage):
+		if engine.add_problem(input):
+			storage.add_problem(input)
 
 def add_solution(inPut, preferences):
 	if inPut in decisions :
@@ -52,30 +133,21 @@ def add_solution(inPut, preferences):
 		solution = input("\n"+msg+" ")
 		if preferences == 'default' :
 			while solution.lower() != 'stop' :
-				if solution not in decisions[inPut]:
-					decisions[inPut].append({"solutions": solution, "ranking": [], "mood": [], "history": 0})
-				with open(DECISION_FILE, 'w') as f:
-					json.dump(decisions, f)
+				save_solution(inPut, lambda: engine.add_solution(inPut, solution))
 				msg = textwrap.fill("Enter an option for the problem. Enter 'stop' when you are finished.", width=100)
 				solution = input("\n"+msg+" ")
 		if preferences == 'num' :
 			while solution.lower() != 'stop' :
 				msg = textwrap.fill("Enter a ranking for that option. Remember more than one option can have the same ranking.", width=100)
 				rank = input("\n"+msg+" ")
-				if solution not in decisions[inPut]:
-					decisions[inPut].append({"solutions": solution, "ranking": rank, "mood": [], "history": 0})
-				with open(DECISION_FILE, 'w') as f:
-					json.dump(decisions, f)
+				save_solution(inPut, lambda: engine.add_solution(inPut, solution, ranking=rank))
 				msg = textwrap.fill("Enter an option for the problem. Enter 'stop' when you are finished.", width=100)
 				solution = input("\n"+msg+" ")
 		if preferences == 'mood' :
 			while solution.lower() != 'stop' :
 				msg = textwrap.fill("Enter a mood corresponding to this option. More than one option can have the same mood.", width=100)
 				mood = input("\n"+msg+" ")
-				if solution not in decisions[inPut]:
-					decisions[inPut].append({"solutions": solution, "ranking": [], "mood": mood, "history": 0})
-				with open(DECISION_FILE, 'w') as f:
-					json.dump(decisions, f)
+				save_solution(inPut, lambda: engine.add_solution(inPut, solution, moods=[mood]))
 				msg = textwrap.fill("Enter an option for the problem. Enter 'stop' when you are finished.", width=100)
 				solution = input("\n"+msg+" ")
 
@@ -121,16 +193,14 @@ def get_solutions(problem, decisions, preferences, mood):
 						problem = temp_problem
 						for solution in decisions[problem] :
 							print(solution["solutions"])
-							solution["ranking"] = input("\nRank this solution. ")
-							with open (DECISION_FILE, 'w') as f:
-								json.dump(decisions, f)
+							rank = input("\nRank this solution. ")
+							save_solution(problem, lambda: engine.update_solution(problem, solution["solutions"], ranking=rank))
 					if preferences == 'mood' :
 						problem = temp_problem
 						for solution in decisions[problem] :
 							print("\n"+solution["solutions"])
-							solution["mood"] = input("\nEnter the mood that is preferred for this solution. ")
-							with open (DECISION_FILE, 'w') as f:
-								json.dump(decisions, f)
+							preferred = input("\nEnter the mood that is preferred for this solution. ")
+							save_solution(problem, lambda: engine.update_solution(problem, solution["solutions"], moods=[preferred]))
 			solution = input("\nDo you want to add an option for the decision? ")
 			if solution.upper() == 'Y' or solution.upper() == 'YES' or solution.upper() == 'YEAH' or solution.upper() == 'YE' :
 				add_solution(problem, preferences)
@@ -148,46 +218,19 @@ def get_solutions(problem, decisions, preferences, mood):
 	return result["solutions"]
 
 def get_choice(input, mood, preferences):
-	if preferences == 'default':
-		if decisions[input] == []:
-			return 'nothing'
-		else:
-			return random.choice(decisions[input])
-	if preferences == 'num':
-		solutions = [solution for solution in decisions[input] if solution["ranking"] == '1']
-		if solutions == []:
-			return 'nothing'
-		else:
-			return random.choice(solutions)
-	if preferences == 'mood':
-		solutions = [solution for solution in decisions[input] if solution["mood"].lower() == mood.lower()]
-		if solutions == []:
-			return 'nothing'
-		else :
-			return random.choice(solutions)
-	if preferences == 'history':
-		total = 0
-		length = 0
-		result = []
-		for solution in decisions[input]:
-			total = total + solution["history"]
-			length += 1
-		if total == 0 or length == 0 :
-			return 'nothing'
-		for solution in decisions[input]:
-			percent = solution["history"]/total
-			if percent >= 1/length:
-				result.append(solution)
-		if result == []:
-			return 'inconclusive'
-		else :
-			return random.choice(result)
+	if not decisions[input]:
+		return 'nothing'
+	solution, reason = engine.choose(input, preferences, mood=mood)
+	if solution is None:
+		return 'inconclusive' if preferences == 'history' and engine.index(input).total_history else 'nothing'
+	return solution
 
 def main():
-	global decisions
+	global decisions, engine
 	preferences = ""
 	preferences = check_preferences(preferences)
 	decisions = load_data()
+	engine = DecisionEngine(decisions)
 	msg = textwrap.fill("Enter the problem you want a decision to be made for. Enter 'exit' to stop running the program.", width=100)
 	problem = input("\n"+msg+" ")
 	while problem.lower() != 'exit':
@@ -197,11 +240,9 @@ def main():
 		else :
 			mood = ""
 		solution = get_solutions(problem, decisions, preferences, mood.lower())
-		for index in decisions[problem] :
-			if index["solutions"] == solution :
-				index["history"] += 1
-				with open(DECISION_FILE, 'w') as f:
-					json.dump(decisions, f)
+		save_solution(problem, lambda: engine.record_accept(problem, solution))
+		trends.record(problem, solution)
+		timeline.record(problem, solution)
 		msg = textwrap.fill("Do you want to change your preferences before you enter a new problem.", width=100)
 		temp_preferences = input("\n"+msg+" ")
 		if temp_preferences.lower() == 'y' or temp_preferences.lower() == 'yes' or temp_preferences.lower == 'ye' or temp_preferences.lower() == 'yeah' :
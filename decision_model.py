@@ -0,0 +1,128 @@
+import sys
+from collections.abc import Mapping
+
+# --- Compact Solutions ---
+# A solution dict with its own mood list costs several hundred bytes. Loaders
+# turn every solution into a Solution instead: four slots for the stored
+# fields plus the parsed rank and normalized moods, with mood strings and
+# whole mood tuples shared through a symbol table. It still reads like the
+# dict it replaces (sol["history"], sol.get("mood")), and solution_to_json
+# gives back exactly the dict it was made from, so files round-trip
+# unchanged. Anything that is not a plain four-field solution stays a dict.
+FIELDS = ("solutions", "ranking", "mood", "history")
+_FIELD_SET = frozenset(FIELDS)
+_MOOD_TUPLES = {(): ()}
+_NORMALIZED = {(): ()}
+
+
+def intern_moods(moods):
+    """Return the shared tuple for ``moods``, interning each string once."""
+    key = tuple(moods)
+    shared = _MOOD_TUPLES.get(key)
+    if shared is None:
+        shared = _MOOD_TUPLES[key] = tuple(sys.intern(m) for m in key)
+    return shared
+
+
+def _parse_rank(ranking):
+    # Mirrors solution_rank: old files store ranks as strings or [].
+    if isinstance(ranking, str):
+        try:
+            return int(ranking)
+        except ValueError:
+            return 0
+    if isinstance(ranking, (int, float)):
+        return int(ranking)
+    return 0
+
+
+def _normalize_moods(mood):
+    # The lowercased, stripped moods the indexes use, worked out once per
+    # distinct mood value.
+    normalized = _NORMALIZED.get(mood)
+    if normalized is None:
+        parts = mood.split(",") if isinstance(mood, str) else mood
+        normalized = _NORMALIZED[mood] = intern_moods(m.strip().lower() for m in parts if m and m.strip())
+    return normalized
+
+
+class Solution(Mapping):
+    __slots__ = ("name", "_ranking", "_mood", "history", "rank", "moods")
+
+    def __init__(self, name, ranking=0, mood=(), history=0):
+        self.name = name
+        self.history = history
+        self["ranking"] = ranking
+        self["mood"] = mood
+
+    def __getitem__(self, key):
+        if key == "solutions":
+            return self.name
+        if key == "history":
+            return self.history
+        if key == "ranking":
+            return self._ranking
+        if key == "mood":
+            return list(self._mood) if isinstance(self._mood, tuple) else self._mood
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "solutions":
+            self.name = value
+        elif key == "history":
+            self.history = value
+        elif key == "ranking":
+            self._ranking = value
+            self.rank = _parse_rank(value)
+        elif key == "mood":
+            self._mood = value if isinstance(value, str) else intern_moods(value)
+            self.moods = _normalize_moods(self._mood)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, (Solution, dict)):
+            return solution_to_json(self) == (solution_to_json(other) if isinstance(other, Solution) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Solution({solution_to_json(self)!r})"
+
+
+def compact_solution(sol):
+    """Return a Solution for a plain solution dict, or ``sol`` itself when it carries anything else."""
+    if type(sol) is not dict or tuple(sol) != FIELDS:
+        return sol
+    mood, history = sol["mood"], sol["history"]
+    if type(history) is not int or not (isinstance(mood, str) or
+                                         (type(mood) is list and all(type(m) is str for m in mood))):
+        return sol
+    return Solution(sol["solutions"], sol["ranking"], mood, history)
+
+
+def compact_solutions(solutions):
+    if type(solutions) is not list:
+        return solutions
+    return [compact_solution(sol) for sol in solutions]
+
+
+def solution_to_json(sol):
+    """``json.dumps`` default hook: the dict a Solution stands for."""
+    if isinstance(sol, Solution):
+        mood = sol._mood
+        return {"solutions": sol.name, "ranking": sol._ranking, "mood": list(mood) if type(mood) is tuple else mood,
+                "history": sol.history}
+    raise TypeError(f"Object of type {type(sol).__name__} is not JSON serializable")
@@ -0,0 +1,165 @@
+# --- Mood Lookup ---
+# Mood names live in a trie so a query word can be matched exactly, by prefix
+# ("co" -> cozy, comfort) or, failing both, by the nearest names within a small
+# edit distance ("cozi" -> cozy). Each ProblemIndex keeps one over its own
+# moods; MoodCatalog keeps one over every problem's moods, together with
+# which problems use each mood.
+MOOD_MATCHES = ("any", "all", "best")
+
+
+def normalize_match(match):
+    match = (match or "best").strip().lower()
+    return match if match in MOOD_MATCHES else "best"
+
+
+class MoodTrie:
+    """Prefix tree over mood names, with a reference count per name."""
+
+    __slots__ = ("root", "counts")
+
+    def __init__(self, moods=()):
+        self.root = {}
+        self.counts = {}
+        for mood in moods:
+            self.add(mood)
+
+    def __contains__(self, mood):
+        return mood in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, mood):
+        count = self.counts.get(mood, 0)
+        self.counts[mood] = count + 1
+        if count:
+            return
+        node = self.root
+        for ch in mood:
+            node = node.setdefault(ch, {})
+        node[None] = mood
+
+    def discard(self, mood):
+        count = self.counts.get(mood)
+        if not count:
+            return
+        if count > 1:
+            self.counts[mood] = count - 1
+            return
+        del self.counts[mood]
+        path, node = [self.root], self.root
+        for ch in mood:
+            node = node[ch]
+            path.append(node)
+        del node[None]
+        # Prune the branch back up to the first node something else still uses.
+        for ch, parent in zip(reversed(mood), reversed(path[:-1])):
+            if parent[ch]:
+                break
+            del parent[ch]
+
+    def prefixed(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        found, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            for ch, child in node.items():
+                if ch is None:
+                    found.append(child)
+                else:
+                    stack.append(child)
+        return sorted(found)
+
+    def near(self, word, max_distance):
+        """Return ``(distance, mood)`` for every mood within ``max_distance`` edits of ``word``."""
+        # Levenshtein rows are carried down the trie, so a shared prefix is
+        # only compared once and a branch stops as soon as no row entry is
+        # within reach.
+        found = []
+        stack = [(child, ch, range(len(word) + 1)) for ch, child in self.root.items() if ch is not None]
+        while stack:
+            node, ch, above = stack.pop()
+            row = [above[0] + 1]
+            for i in range(1, len(word) + 1):
+                row.append(min(row[i - 1] + 1, above[i] + 1, above[i - 1] + (word[i - 1] != ch)))
+            if None in node and row[-1] <= max_distance:
+                found.append((row[-1], node[None]))
+            if min(row) <= max_distance:
+                stack.extend((child, next_ch, row) for next_ch, child in node.items() if next_ch is not None)
+        return sorted(found)
+
+    def expand(self, term, max_distance=None):
+        """Moods a query word stands for: itself, else every prefix match, else the closest near misses."""
+        if term in self.counts:
+            return [term]
+        found = self.prefixed(term)
+        if found:
+            return found
+        if max_distance is None:
+            max_distance = 1 if len(term) <= 5 else 2
+        near = self.near(term, max_distance)
+        return [mood for distance, mood in near if distance == near[0][0]] if near else []
+
+
+class MoodCatalog:
+    """Moods across every problem: mood -> {problem: solutions with that mood}, plus a trie of all of them."""
+
+    def __init__(self):
+        self.problems = {}
+        self.trie = MoodTrie()
+
+    def add(self, problem, moods, count=1):
+        for mood in moods:
+            counts = self.problems.setdefault(mood, {})
+            if problem not in counts:
+                self.trie.add(mood)
+                counts[problem] = 0
+            counts[problem] += count
+
+    def remove(self, problem, moods):
+        for mood in moods:
+            counts = self.problems.get(mood)
+            if not counts or problem not in counts:
+                continue
+            counts[problem] -= 1
+            if counts[problem] <= 0:
+                self._drop(mood, counts, problem)
+
+    def drop_problem(self, problem, moods):
+        for mood in moods:
+            counts = self.problems.get(mood)
+            if counts and problem in counts:
+                self._drop(mood, counts, problem)
+
+    def _drop(self, mood, counts, problem):
+        del counts[problem]
+        self.trie.discard(mood)
+        if not counts:
+            del self.problems[mood]
+
+    def find(self, terms, match="any"):
+        """Return ``[(problem, terms matched)]``, best first, for problems whose moods match ``terms``."""
+        groups = [self.trie.expand(term) for term in terms]
+        scores = {}
+        for group in groups:
+            for problem in {problem for mood in group for problem in self.problems[mood]}:
+                scores[problem] = scores.get(problem, 0) + 1
+        return sorted(match_scores(scores, len(groups), normalize_match(match)).items(),
+                      key=lambda item: (-item[1], item[0]))
+
+
+def match_scores(scores, terms, match):
+    """Keep the ``{key: terms matched}`` entries that satisfy ``match`` out of ``terms`` query words."""
+    if not scores:
+        return {}
+    if match == "all":
+        wanted = terms
+    elif match == "best":
+        wanted = max(scores.values())
+    else:
+        return scores
+    return {key: score for key, score in scores.items() if score == wanted}
@@ -0,0 +1,78 @@
+import time
+
+from decision_journal import LoggedState
+from decision_metrics import metrics
+
+# --- Rejection Log ---
+# "Avoid Repeats" rejections are appended to "<decisions file>.rejections" with
+# an expiry time, so they outlive the session that made them and are shared by
+# every frontend (which is why frontends only record a rejection while Avoid
+# Repeats is on). Expired entries are dropped lazily, the next time the
+# problem's rejections are looked at, and the log is rewritten with only the
+# live entries once it grows well past them.
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class RejectionStore(LoggedState):
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.rejected = {}
+        self._masks = {}
+        super().__init__(path)
+
+    def _reset(self):
+        self.rejected, self._masks = {}, {}
+
+    def _apply(self, record):
+        problem = record["problem"]
+        if record.get("reset"):
+            self.rejected.pop(problem, None)
+        else:
+            self.rejected.setdefault(problem, {})[record["solution"]] = record["expires"]
+        self._masks.pop(problem, None)
+
+    def _live(self):
+        return sum(len(names) for names in self.rejected.values())
+
+    def _records(self):
+        return [{"problem": problem, "solution": name, "expires": expires}
+                for problem, names in self.rejected.items() for name, expires in names.items()]
+
+    def reject(self, problem, name):
+        with self.lock:
+            self._append([{"problem": problem, "solution": name, "expires": time.time() + self.ttl}])
+
+    def reset(self, problem):
+        with self.lock:
+            if problem in self.rejected:
+                self._append([{"problem": problem, "reset": True}])
+
+    def active(self, problem, now=None):
+        """The problem's live rejections as ``{name: expires}`` (a copy)."""
+        with self.lock:
+            return dict(self._active(problem, now))
+
+    def _active(self, problem, now=None):
+        # Callers hold self.lock: refresh() on another thread changes these dicts.
+        names = self.rejected.get(problem)
+        if not names:
+            return {}
+        now = time.time() if now is None else now
+        if min(names.values()) <= now:
+            for name in [name for name, expires in names.items() if expires <= now]:
+                del names[name]
+            self._masks.pop(problem, None)
+        return names
+
+    def exclusion(self, problem, engine):
+        """Return the problem's live rejections as an ExclusionMask for ``engine``, or None."""
+        with self.lock:
+            names = self._active(problem)
+            if not names:
+                return None
+            index = engine.index(problem)
+            cached = self._masks.get(problem)
+            if cached is None or cached.index is not index:
+                with metrics.timer("decision_eligibility_seconds"):
+                    cached = self._masks[problem] = index.mask(names)
+            return cached
@@ -0,0 +1,257 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("decision_simulate.py needs NumPy (pip install numpy).")
+
+from decision_engine import (ProblemIndex, TRENDY_WINDOW, normalize_strategy, parse_moods, solution_history,
+                             solution_rank)
+from decision_moods import MOOD_MATCHES, normalize_match
+from decision_storage import STORAGE_ERRORS, open_storage
+
+# Monte Carlo estimate of how often each option comes up under each strategy,
+# before any ranks or moods are changed:
+#
+#     python decision_simulate.py dinner --draws 1000000
+#     python decision_simulate.py dinner -s weighted -s most --steps 50 --json
+#
+# Strategies that ignore history (default, ranking, mood) are sampled straight
+# from their fixed distribution. The rest are simulated as many independent
+# runs of `steps` accepts each, where every accept raises the chosen option's
+# history (and feeds the trendy window) before the next draw. Runs are
+# vectorized across rows of a NumPy array, and large batches are split into
+# chunks spread over a process pool. Misses fall back to a random choice the
+# same way DecisionEngine.decide does, and every run starts with an empty
+# trendy window. Needs NumPy; nothing else imports this module.
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
+STRATEGIES = ("default", "ranking", "mood", "most", "least", "weighted", "history", "trendy")
+STATIC_STRATEGIES = ("default", "ranking", "mood")
+NO_FALLBACK = ("mood", "history")
+CHUNK_CELLS = 2_000_000
+
+
+class ProblemArrays:
+    """Columnar view of one problem: names, rank and history arrays, and a mask per mood."""
+
+    def __init__(self, solutions):
+        self.names = [sol["solutions"] for sol in solutions]
+        self.rank = np.array([solution_rank(sol) for sol in solutions], dtype=np.int64)
+        self.history = np.array([solution_history(sol) for sol in solutions], dtype=np.int64)
+        self.index = ProblemIndex(solutions)
+        self.moods = {mood: np.array([sol["solutions"] in bucket for sol in solutions], dtype=bool)
+                      for mood, bucket in self.index.moods.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def mood_mask(self, text, match="best"):
+        # Same resolution as the engine: each word goes through the mood trie,
+        # then solutions are scored by how many words they match.
+        groups = [self.index.mood_trie.expand(term) for term in parse_moods(text or "")]
+        scores = np.zeros(len(self), dtype=np.int64)
+        for group in groups:
+            hit = np.zeros(len(self), dtype=bool)
+            for mood in group:
+                hit |= self.moods[mood]
+            scores += hit
+        if not groups or not scores.any():
+            return np.zeros(len(self), dtype=bool)
+        match = normalize_match(match)
+        if match == "any":
+            return scores > 0
+        return scores == (len(groups) if match == "all" else scores.max())
+
+    def __getstate__(self):
+        # The ProblemIndex holds plain solution objects; workers only need the arrays.
+        state = dict(self.__dict__)
+        state["index"] = None
+        return state
+
+
+# --- Single Draw ---
+def draw_probabilities(arrays, strategy, mood=None, match="best"):
+    """Exact selection probabilities of one draw from the problem's current history."""
+    n = len(arrays)
+    history = arrays.history
+    if strategy == "weighted" and history.sum() > 0:
+        return history / history.sum()
+    if strategy == "ranking":
+        ranked = arrays.rank[arrays.rank > 0]
+        mask = arrays.rank == ranked.min() if ranked.size else np.zeros(n, dtype=bool)
+    elif strategy == "mood":
+        mask = arrays.mood_mask(mood, match)
+    elif strategy == "most":
+        mask = (history == history.max()) & (history >= 1)
+    elif strategy == "least":
+        mask = history == history.min()
+    elif strategy == "history":
+        mask = (history * n >= history.sum()) & (history.sum() > 0)
+    else:
+        # default, weighted with no history yet, and trendy with an empty window.
+        mask = np.ones(n, dtype=bool)
+    if not mask.any() and strategy not in NO_FALLBACK:
+        mask = np.ones(n, dtype=bool)
+    return mask / mask.sum() if mask.any() else mask.astype(float)
+
+
+# --- Feedback Simulation ---
+def _uniform_rows(rng, mask):
+    # Uniform choice per row among its True entries: the largest random key
+    # wins, and masked-out entries can never beat an eligible one.
+    keys = rng.random(mask.shape)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+def _step(rng, strategy, history, window):
+    runs, n = history.shape
+    rows = np.arange(runs)
+    if strategy == "weighted":
+        totals = history.sum(axis=1)
+        cumulative = history.cumsum(axis=1)
+        targets = rng.random(runs) * totals
+        choice = (cumulative <= targets[:, None]).sum(axis=1)
+        hit = totals > 0
+        return np.where(hit, np.minimum(choice, n - 1), _uniform_rows(rng, np.ones_like(history, dtype=bool))), hit
+    if strategy == "trendy":
+        counts = np.zeros((runs, n), dtype=np.int64)
+        filled = window >= 0
+        np.add.at(counts, (np.broadcast_to(rows[:, None], window.shape)[filled], window[filled]), 1)
+        hit = filled.any(axis=1)
+        return np.where(hit, counts.argmax(axis=1), _uniform_rows(rng, np.ones_like(history, dtype=bool))), hit
+    if strategy == "most":
+        top = history.max(axis=1, keepdims=True)
+        mask = (history == top) & (top >= 1)
+    elif strategy == "least":
+        mask = history == history.min(axis=1, keepdims=True)
+    else:
+        # "history": at least an even share of the accepts so far.
+        totals = history.sum(axis=1, keepdims=True)
+        mask = (history * n >= totals) & (totals > 0)
+    hit = mask.any(axis=1)
+    if strategy not in NO_FALLBACK:
+        mask = np.where(hit[:, None], mask, True)
+    return _uniform_rows(rng, mask), hit
+
+
+def simulate_chunk(arrays, strategy, runs, steps, seed):
+    """Simulate ``runs`` independent runs of ``steps`` accepts; return (selection counts, misses)."""
+    rng = np.random.default_rng(seed)
+    n = len(arrays)
+    history = np.broadcast_to(arrays.history, (runs, n)).copy()
+    window = np.full((runs, TRENDY_WINDOW), -1, dtype=np.int64)
+    rows = np.arange(runs)
+    counts = np.zeros(n, dtype=np.int64)
+    misses = 0
+    for step in range(steps):
+        choice, hit = _step(rng, strategy, history, window)
+        if strategy in NO_FALLBACK:
+            misses += int((~hit).sum())
+            rows_hit, choice = rows[hit], choice[hit]
+        else:
+            rows_hit = rows
+        counts += np.bincount(choice, minlength=n)
+        history[rows_hit, choice] += 1
+        window[rows_hit, step % TRENDY_WINDOW] = choice
+    return counts, misses
+
+
+def simulate(arrays, strategy, draws=1_000_000, steps=100, mood=None, match="best", feedback=True,
+             workers=None, seed=None):
+    """Return ``{name: probability}`` plus the share of draws where the strategy chose nothing."""
+    strategy = normalize_strategy(strategy)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Cannot simulate the '{strategy}' strategy.")
+    n = len(arrays)
+    if n == 0:
+        return {"strategy": strategy, "draws": 0, "probabilities": {}, "no_choice": 1.0}
+    seeds = np.random.SeedSequence(seed)
+    if strategy in STATIC_STRATEGIES or not feedback:
+        p = draw_probabilities(arrays, strategy, mood, match)
+        counts = np.random.default_rng(seeds).multinomial(draws, np.append(p, max(0.0, 1.0 - p.sum())))
+        counts, misses = counts[:-1], int(counts[-1])
+    else:
+        runs = math.ceil(draws / steps)
+        chunk = max(1, CHUNK_CELLS // n)
+        sizes = [min(chunk, runs - start) for start in range(0, runs, chunk)]
+        jobs = list(zip(sizes, seeds.spawn(len(sizes))))
+        counts, misses = np.zeros(n, dtype=np.int64), 0
+        if workers == 1 or len(jobs) == 1:
+            results = (simulate_chunk(arrays, strategy, size, steps, job_seed) for size, job_seed in jobs)
+            for chunk_counts, chunk_misses in results:
+                counts += chunk_counts
+                misses += chunk_misses
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(simulate_chunk, arrays, strategy, size, steps, job_seed) for size, job_seed in jobs]
+                for future in futures:
+                    chunk_counts, chunk_misses = future.result()
+                    counts += chunk_counts
+                    misses += chunk_misses
+        draws = runs * steps
+    return {"strategy": strategy, "draws": int(draws),
+            "probabilities": {name: float(c) / draws for name, c in zip(arrays.names, counts)},
+            "no_choice": misses / draws}
+
+
+def format_report(problem, results, top=10):
+    lines = [f"Selection probabilities for '{problem}':"]
+    for result in results:
+        lines.append(f"\n{result['strategy']} ({result['draws']:,} draws)")
+        ranked = sorted(result["probabilities"].items(), key=lambda item: -item[1])
+        for name, p in ranked[:top]:
+            lines.append(f"  {p:7.2%}  {name}")
+        if len(ranked) > top:
+            lines.append(f"  ... {len(ranked) - top} more")
+        if result["no_choice"]:
+            lines.append(f"  {result['no_choice']:7.2%}  (nothing chosen)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate how often each option is chosen under each strategy.")
+    parser.add_argument("problem")
+    parser.add_argument("-s", "--strategy", action="append", help="strategy to simulate (repeatable; default all)")
+    parser.add_argument("-m", "--mood", default="", help="mood(s) for the mood strategy")
+    parser.add_argument("--match", choices=MOOD_MATCHES, default="best")
+    parser.add_argument("-n", "--draws", type=int, default=1_000_000)
+    parser.add_argument("--steps", type=int, default=100, help="accepts per simulated run (default 100)")
+    parser.add_argument("--no-feedback", action="store_true", help="do not let accepts raise history between draws")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-f", "--file", default=DECISION_FILE)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.file)
+    try:
+        decisions = storage.load()
+        if args.problem not in decisions:
+            sys.exit(f"Unknown problem '{args.problem}'.")
+        arrays = ProblemArrays(decisions[args.problem])
+    except STORAGE_ERRORS as e:
+        sys.exit(f"{args.file}: {e}")
+    finally:
+        storage.close()
+
+    strategies = [normalize_strategy(s) for s in args.strategy] if args.strategy else list(STRATEGIES)
+    for name, strategy in zip(args.strategy or (), strategies):
+        if strategy not in STRATEGIES:
+            # popular picks from the accept timeline, which a run does not have.
+            parser.error(f"cannot simulate '{name}'; choose from {', '.join(STRATEGIES)}")
+    results = [simulate(arrays, strategy, args.draws, max(1, args.steps), args.mood, args.match,
+                        not args.no_feedback, args.workers, args.seed) for strategy in strategies]
+    if args.json:
+        print(json.dumps({"problem": args.problem, "results": results}))
+    else:
+        print(format_report(args.problem, results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from decision_engine import solution_history, solution_moods, solution_rank
+from decision_journal import DecisionJournal, LazyDecisions, VersionConflict
+from decision_metrics import metrics
+from decision_model import Solution
+
+# --- Storage Selection ---
+# Every backend offers the same calls: load() returns a decisions mapping, and
+# add_problem / delete_problem / put_solution / delete_solution persist one
+# change (put_solutions persists several in one write, put_batch several
+# (problem, solution) pairs). decisions.json (plus its journal) stays the default; a .db/.sqlite
+# path switches to SQLite. Both backends load problems on first use.
+#
+# Both also keep a version per problem that every process sharing the file
+# agrees on, and a transaction() that holds the write lock after catching up
+# on what other processes wrote. Changes made through writing() below are
+# therefore applied to the latest data: an accept adds one to the history as
+# it stands on disk rather than overwriting it, and an edit is refused with
+# VersionConflict only if someone else changed the rank or moods of a solution
+# it touches since it started (accepts and other solutions merge).
+# decision_stress.py checks all of this with several processes at once.
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+STORAGE_ERRORS = (OSError, json.JSONDecodeError, sqlite3.Error, VersionConflict)
+BULK_ROWS = 100
+
+
+def open_storage(path):
+    if path.endswith(SQLITE_SUFFIXES):
+        return SQLiteStorage(path)
+    return DecisionJournal(path, lazy=True)
+
+
+@contextmanager
+def writing(engine, storage, expect=None):
+    """Change ``engine`` and persist it to ``storage`` on top of what other processes saved.
+
+    Yields the problems other processes changed (None for all of them), which
+    have been reloaded. ``expect`` maps problems to ``{solution: (rank,
+    moods)}`` as an edit first saw them (see DecisionEngine.edit_base);
+    VersionConflict is raised before anything changes if one has moved on.
+    """
+    with storage.transaction() as changed:
+        invalidate_changed(engine, changed)
+        for problem, bases in (expect or {}).items():
+            moved = [name for name, base in bases.items() if engine.edit_base(problem, name) != base]
+            if moved:
+                raise VersionConflict(problem, moved)
+        yield changed
+
+
+def invalidate_changed(engine, changed):
+    """Drop what ``engine`` built from the problems a transaction() reported as changed."""
+    if changed is None:
+        engine.invalidate()
+    else:
+        for problem in changed:
+            engine.invalidate(problem)
+
+
+def refresh(engine, storage):
+    """Pick up what other processes saved; return the problems that changed (None when all of them did)."""
+    with writing(engine, storage) as changed:
+        return changed
+
+
+# --- SQLite Backend ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS solutions (
+    id INTEGER PRIMARY KEY,
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    ranking INTEGER NOT NULL DEFAULT 0,
+    history INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (problem_id, name)
+);
+CREATE TABLE IF NOT EXISTS moods (
+    solution_id INTEGER NOT NULL REFERENCES solutions(id) ON DELETE CASCADE,
+    mood TEXT NOT NULL,
+    PRIMARY KEY (solution_id, mood)
+);
+CREATE INDEX IF NOT EXISTS solutions_by_rank ON solutions (problem_id, ranking);
+CREATE INDEX IF NOT EXISTS solutions_by_history ON solutions (problem_id, history);
+CREATE INDEX IF NOT EXISTS moods_by_mood ON moods (mood);
+CREATE TABLE IF NOT EXISTS versions (
+    problem TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_by_seq ON versions (seq);
+"""
+
+
+class SQLiteStorage:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        # Lazy loads read through their own connection while no write is in
+        # progress, so they never queue behind BEGIN IMMEDIATE waiting for
+        # another process to commit.
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+        self.decisions = {}
+        self.versions = {}
+        self._seq = 0
+        self._lock = threading.RLock()
+        self.view_lock = threading.RLock()
+        self._depth = 0
+
+    def load(self):
+        self.versions, self._seq = {}, 0
+        for problem, version, seq in self.conn.execute("SELECT problem, version, seq FROM versions"):
+            self.versions[problem] = version
+            self._seq = max(self._seq, seq)
+        self.decisions = LazyDecisions(self)
+        return self.decisions
+
+    # --- Versions & Locking ---
+    # Every write bumps its problem's row in `versions` and stamps it with
+    # the next value of a database-wide sequence, so catching up is one
+    # query for the rows stamped after the last one we saw.
+    def version(self, problem):
+        return self.versions.get(problem, 0)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield set()
+                finally:
+                    self._depth -= 1
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            with self.view_lock:
+                self._depth = 1
+            try:
+                yield self.catch_up()
+                with self.view_lock:
+                    self.conn.commit()
+                    self._depth = 0
+            except BaseException:
+                with self.view_lock:
+                    self.conn.rollback()
+                    self._depth = 0
+                raise
+
+    def catch_up(self):
+        changed = set()
+        for problem, version, seq in self.conn.execute(
+                "SELECT problem, version, seq FROM versions WHERE seq > ?", (self._seq,)).fetchall():
+            self.versions[problem] = version
+            self._seq = max(self._seq, seq)
+            changed.add(problem)
+        if isinstance(self.decisions, LazyDecisions):
+            exists = {problem: self.conn.execute("SELECT 1 FROM problems WHERE name = ?", (problem,)).fetchone()
+                      for problem in changed}
+            with self.view_lock:
+                for problem in changed:
+                    self.decisions._loaded.pop(problem, None)
+                    if exists[problem]:
+                        self.decisions._names[problem] = None
+                    else:
+                        self.decisions._names.pop(problem, None)
+        return changed
+
+    def _bump(self, problem):
+        version, seq = self.conn.execute(
+            "INSERT INTO versions (problem, version, seq) VALUES (?, 1, (SELECT COALESCE(MAX(seq), 0) + 1 FROM versions)) "
+            "ON CONFLICT (problem) DO UPDATE SET version = version + 1, seq = excluded.seq RETURNING version, seq",
+            (problem,)).fetchone()
+        self.versions[problem] = version
+        self._seq = seq
+
+    def list_problems(self):
+        return [name for (name,) in self.conn.execute("SELECT name FROM problems ORDER BY id")]
+
+    def load_problem(self, problem):
+        with metrics.timer("decision_storage_seconds", backend="sqlite", op="load"), self.view_lock:
+            # Inside a write, only the writing connection sees what it wrote.
+            return self._load_problem(self.conn if self._depth else self.reader, problem)
+
+    def _load_problem(self, conn, problem):
+        rows = conn.execute(
+            "SELECT s.id, s.name, s.ranking, s.history FROM solutions s JOIN problems p ON p.id = s.problem_id "
+            "WHERE p.name = ? ORDER BY s.id", (problem,)).fetchall()
+        moods = {}
+        if rows:
+            for solution_id, mood in conn.execute(
+                    "SELECT m.solution_id, m.mood FROM moods m JOIN solutions s ON s.id = m.solution_id "
+                    "JOIN problems p ON p.id = s.problem_id WHERE p.name = ? ORDER BY m.rowid", (problem,)):
+                moods.setdefault(solution_id, []).append(mood)
+        return [Solution(name, ranking, moods.get(solution_id, ()), history)
+                for solution_id, name, ranking, history in rows]
+
+    def _problem_id(self, problem):
+        self.conn.execute("INSERT OR IGNORE INTO problems (name) VALUES (?)", (problem,))
+        return self.conn.execute("SELECT id FROM problems WHERE name = ?", (problem,)).fetchone()[0]
+
+    def _put_solution(self, problem_id, sol):
+        solution_id = self.conn.execute(
+            "INSERT INTO solutions (problem_id, name, ranking, history) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (problem_id, name) DO UPDATE SET ranking = excluded.ranking, history = excluded.history "
+            "RETURNING id",
+            (problem_id, sol["solutions"], solution_rank(sol), solution_history(sol))).fetchone()[0]
+        self.conn.execute("DELETE FROM moods WHERE solution_id = ?", (solution_id,))
+        self.conn.executemany("INSERT OR IGNORE INTO moods (solution_id, mood) VALUES (?, ?)",
+                              [(solution_id, mood) for mood in solution_moods(sol)])
+
+    def _put_many(self, problem_id, sols):
+        # Bulk writes (imports) go through executemany, then look the ids up
+        # in one pass over the problem rather than one RETURNING per row.
+        if len(sols) < BULK_ROWS:
+            for sol in sols:
+                self._put_solution(problem_id, sol)
+            return
+        self.conn.executemany(
+            "INSERT INTO solutions (problem_id, name, ranking, history) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (problem_id, name) DO UPDATE SET ranking = excluded.ranking, history = excluded.history",
+            [(problem_id, sol["solutions"], solution_rank(sol), solution_history(sol)) for sol in sols])
+        ids = dict(self.conn.execute("SELECT name, id FROM solutions WHERE problem_id = ?", (problem_id,)))
+        self.conn.executemany("DELETE FROM moods WHERE solution_id = ?", [(ids[sol["solutions"]],) for sol in sols])
+        self.conn.executemany("INSERT OR IGNORE INTO moods (solution_id, mood) VALUES (?, ?)",
+                              [(ids[sol["solutions"]], mood) for sol in sols for mood in solution_moods(sol)])
+
+    # --- Change Records ---
+    def add_problem(self, problem):
+        with self.transaction():
+            self._problem_id(problem)
+            self._bump(problem)
+
+    def delete_problem(self, problem):
+        with self.transaction():
+            self.conn.execute("DELETE FROM problems WHERE name = ?", (problem,))
+            self._bump(problem)
+
+    def put_solution(self, problem, sol):
+        with metrics.timer("decision_storage_seconds", backend="sqlite", op="save"), self.transaction():
+            self._put_solution(self._problem_id(problem), sol)
+            self._bump(problem)
+
+    def put_solutions(self, problem, sols):
+        with metrics.timer("decision_storage_seconds", backend="sqlite", op="save"), self.transaction():
+            self._put_many(self._problem_id(problem), sols)
+            self._bump(problem)
+
+    def put_batch(self, changes):
+        with metrics.timer("decision_storage_seconds", backend="sqlite", op="save"), self.transaction():
+            by_problem = {}
+            for problem, sol in changes:
+                by_problem.setdefault(problem, []).append(sol)
+            for problem, sols in by_problem.items():
+                self._put_many(self._problem_id(problem), sols)
+                self._bump(problem)
+
+    def delete_solution(self, problem, name):
+        with self.transaction():
+            self.conn.execute(
+                "DELETE FROM solutions WHERE name = ? AND problem_id = (SELECT id FROM problems WHERE name = ?)",
+                (name, problem))
+            self._bump(problem)
+
+    def import_decisions(self, decisions):
+        with self.transaction():
+            for problem, solutions in decisions.items():
+                self._put_many(self._problem_id(problem), list(solutions))
+                self._bump(problem)
+
+    def close(self):
+        self.conn.close()
+        self.reader.close()
+
+
+# --- JSON -> SQLite Migration ---
+def migrate_json_to_sqlite(json_path, db_path):
+    decisions = DecisionJournal(json_path).load()
+    storage = SQLiteStorage(db_path)
+    try:
+        storage.import_decisions(decisions)
+    finally:
+        storage.close()
+    return sum(len(solutions) for solutions in decisions.values())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python decision_storage.py <decisions.json> <decisions.db>")
+    if not os.path.exists(sys.argv[1]):
+        sys.exit(f"{sys.argv[1]} does not exist.")
+    count = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Migrated {count} solutions into {sys.argv[2]}.")
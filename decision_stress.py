@@ -0,0 +1,126 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from multiprocessing import Pool
+
+from decision_engine import DecisionEngine, solution_history, solution_rank
+from decision_journal import DecisionJournal, VersionConflict
+from decision_storage import SQLiteStorage, refresh, writing
+
+# Multi-process check of the shared write path: every process accepts
+# random options and bumps one shared counter through edit bases, on the
+# same file at once, and the totals must come out exact afterwards.
+#
+#     python decision_stress.py
+#     python decision_stress.py --processes 8 --accepts 1000 --backend json
+#
+# Accepts check that writing() applies each change on top of what the other
+# processes saved (no lost history), across frequent journal compactions on
+# the JSON backend. The counter checks the compare-and-swap path: an edit is
+# only saved if the rank it started from is still current, so the final rank
+# must equal the number of edits that were saved. Exits non-zero on a
+# mismatch.
+BACKENDS = ("json", "sqlite")
+PROBLEM = "stress"
+OPTIONS = 20
+COUNTER = "counter"
+COMPACT_EVERY = 25
+
+
+def open_backend(backend, path):
+    if backend == "json":
+        # Compacting this often makes most writes race a compaction somewhere.
+        return DecisionJournal(path, compact_every=COMPACT_EVERY, sync=False, lazy=True)
+    return SQLiteStorage(path)
+
+
+def setup(backend, path):
+    storage = open_backend(backend, path)
+    try:
+        engine = DecisionEngine(storage.load())
+        with writing(engine, storage):
+            engine.add_problem(PROBLEM)
+            storage.add_problem(PROBLEM)
+            sols = [engine.add_solution(PROBLEM, f"option {i}") for i in range(OPTIONS)]
+            sols.append(engine.add_solution(PROBLEM, COUNTER))
+            storage.put_solutions(PROBLEM, sols)
+    finally:
+        storage.close()
+
+
+def worker(job):
+    """Run one process's share; return (accepts saved, counter edits saved, conflicts seen)."""
+    backend, path, accepts, seed = job
+    rng = random.Random(seed)
+    storage = open_backend(backend, path)
+    saved = edits = conflicts = 0
+    try:
+        engine = DecisionEngine(storage.load())
+        for _ in range(accepts):
+            # The counter's base is read before the accept, so other
+            # processes have a whole write in which to move it.
+            refresh(engine, storage)
+            base = engine.edit_base(PROBLEM, COUNTER)
+            with writing(engine, storage):
+                sol = engine.record_accept(PROBLEM, f"option {rng.randrange(OPTIONS)}")
+                storage.put_solution(PROBLEM, sol)
+            saved += 1
+            if rng.random() < 0.5:
+                try:
+                    with writing(engine, storage, expect={PROBLEM: {COUNTER: base}}):
+                        changed = engine.apply_edits(PROBLEM, {COUNTER: {"ranking": base[0] + 1, "mood": ""}})
+                        storage.put_solutions(PROBLEM, changed)
+                    edits += 1
+                except VersionConflict:
+                    conflicts += 1
+    finally:
+        storage.close()
+    return saved, edits, conflicts
+
+
+def check(backend, processes, accepts, seed, workdir):
+    path = os.path.join(workdir, "stress.db" if backend == "sqlite" else "stress.json")
+    setup(backend, path)
+    with Pool(processes) as pool:
+        results = pool.map(worker, [(backend, path, accepts, seed + i) for i in range(processes)])
+    saved = sum(result[0] for result in results)
+    edits = sum(result[1] for result in results)
+    conflicts = sum(result[2] for result in results)
+
+    storage = open_backend(backend, path)
+    try:
+        solutions = list(storage.load()[PROBLEM])
+    finally:
+        storage.close()
+    history = sum(solution_history(sol) for sol in solutions if sol["solutions"] != COUNTER)
+    rank = next(solution_rank(sol) for sol in solutions if sol["solutions"] == COUNTER)
+    ok = history == saved and rank == edits and len(solutions) == OPTIONS + 1
+    print(f"{backend}: {processes} processes, history {history}/{saved}, counter {rank}/{edits} "
+          f"({conflicts} conflicts), {len(solutions)} options: {'ok' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check concurrent writes from several processes add up exactly.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--accepts", type=int, default=300, help="accepts per process (default 300)")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="default: both")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="decision-stress-")
+    try:
+        ok = []
+        for backend in args.backend or BACKENDS:
+            os.makedirs(os.path.join(workdir, backend))
+            ok.append(check(backend, args.processes, args.accepts, args.seed, os.path.join(workdir, backend)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0 if all(ok) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import calendar
+import time
+
+from decision_journal import AcceptLog
+
+# --- Accept Timeline ---
+# Every accept is counted into hourly, daily and monthly buckets (UTC) per
+# problem and solution, so "how often was this chosen between A and B" is a
+# sum over at most a few dozen buckets rather than a scan of every accept.
+# The log, "<decisions file>.timeline", holds one JSON record per accept and
+# is rewritten as one record per (problem, solution, hour) with a count once
+# it grows well past that; the daily and monthly rollups are rebuilt from the
+# hours on load.
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def month_of_day(day):
+    tm = time.gmtime(day * DAY)
+    return tm.tm_year * 12 + tm.tm_mon - 1
+
+
+def first_day_of_month(month):
+    return calendar.timegm((month // 12, month % 12 + 1, 1, 0, 0, 0)) // DAY
+
+
+class ProblemTimeline:
+    __slots__ = ("hours", "days", "months")
+
+    def __init__(self):
+        self.hours = {}
+        self.days = {}
+        self.months = {}
+
+    def add(self, name, hour, count=1):
+        """Count accepts of ``name`` in ``hour``; return True if that hour had none of it before."""
+        day = hour // 24
+        new = name not in self.hours.get(hour, ())
+        for buckets, key in ((self.hours, hour), (self.days, day), (self.months, month_of_day(day))):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {}
+            bucket[name] = bucket.get(name, 0) + count
+        return new
+
+    def counts(self, start_hour, end_hour):
+        """Sum accepts per solution over hours [start_hour, end_hour)."""
+        totals = {}
+        for granularity, first, last in _cover(start_hour, end_hour):
+            buckets = getattr(self, granularity)
+            for key in range(first, last):
+                for name, count in buckets.get(key, {}).items():
+                    totals[name] = totals.get(name, 0) + count
+        return totals
+
+
+def _cover(start_hour, end_hour):
+    # Splits an hour range into leading hours, leading days, whole months,
+    # trailing days and trailing hours, so no range needs more than 2*23 hour
+    # buckets and 2*30 day buckets on top of its months.
+    first_day, last_day = -(-start_hour // 24), end_hour // 24
+    if first_day >= last_day:
+        return [("hours", start_hour, end_hour)]
+    spans = [("hours", start_hour, first_day * 24), ("hours", last_day * 24, end_hour)]
+    first_month = month_of_day(first_day)
+    if first_day_of_month(first_month) < first_day:
+        first_month += 1
+    last_month = month_of_day(last_day)
+    if first_month >= last_month:
+        return spans + [("days", first_day, last_day)]
+    return spans + [("days", first_day, first_day_of_month(first_month)),
+                    ("months", first_month, last_month),
+                    ("days", first_day_of_month(last_month), last_day)]
+
+
+class AcceptTimeline(AcceptLog):
+    def __init__(self, path):
+        self.problems = {}
+        self.buckets = 0
+        super().__init__(path)
+
+    def _reset(self):
+        self.problems, self.buckets = {}, 0
+
+    def _apply(self, record):
+        hour = record["hour"] if "hour" in record else int(record["time"] // HOUR)
+        timeline = self.problems.get(record["problem"])
+        if timeline is None:
+            timeline = self.problems[record["problem"]] = ProblemTimeline()
+        if timeline.add(record["solution"], hour, record.get("count", 1)):
+            self.buckets += 1
+
+    def _live(self):
+        return self.buckets
+
+    def _records(self):
+        return [{"problem": problem, "solution": name, "hour": hour, "count": count}
+                for problem, timeline in self.problems.items()
+                for hour, bucket in timeline.hours.items() for name, count in bucket.items()]
+
+    def counts(self, problem, since, until=None):
+        """Accepts per solution of ``problem`` from ``since`` to ``until`` (epoch seconds, hour resolution)."""
+        timeline = self.problems.get(problem)
+        if timeline is None:
+            return {}
+        until = time.time() if until is None else until
+        return timeline.counts(int(since // HOUR), -(-int(until) // HOUR))
+
+    def most_chosen(self, problem, days, keep=None):
+        """``(count, [names])`` of the most accepted solutions over the last ``days`` days.
+
+        ``keep``, when given, is called with each name to leave out the ones
+        it returns false for (solutions since deleted, excluded ones).
+        """
+        counts = self.counts(problem, time.time() - days * DAY)
+        if keep is not None:
+            counts = {name: count for name, count in counts.items() if keep(name)}
+        if not counts:
+            return 0, []
+        top = max(counts.values())
+        return top, [name for name, count in counts.items() if count == top]
@@ -0,0 +1,99 @@
+import math
+import time
+from collections import deque
+
+from decision_engine import TRENDY_WINDOW
+from decision_journal import AcceptLog
+
+# --- Trend Log ---
+# Accepted decisions are appended to "<decisions file>.trends", one JSON record
+# per line, so the trend window survives restarts and is visible to every
+# process reading the same file (see AppendLog in decision_journal.py). Only
+# the last `window` accepts per problem matter; the log is rewritten with just
+# those once it grows well past them.
+
+
+class ProblemTrend:
+    """Sliding window of recent accepts with O(1) updates and O(1) leader lookup.
+
+    ``counts`` maps solution -> count inside the window and ``by_count`` maps
+    count -> solutions with that count, so a count moving by one only moves a
+    solution between neighbouring sets and the leader is any member of
+    ``by_count[top]``.
+    """
+
+    __slots__ = ("window", "entries", "counts", "by_count", "top")
+
+    def __init__(self, window):
+        self.window = window
+        self.entries = deque()
+        self.counts = {}
+        self.by_count = {}
+        self.top = 0
+
+    def add(self, name, when):
+        self.entries.append((name, when))
+        self._move(name, 1)
+        if len(self.entries) > self.window:
+            old_name, _ = self.entries.popleft()
+            self._move(old_name, -1)
+
+    def _move(self, name, step):
+        count = self.counts.get(name, 0)
+        if count:
+            bucket = self.by_count[count]
+            bucket.pop(name)
+            if not bucket:
+                del self.by_count[count]
+        count += step
+        if count:
+            self.counts[name] = count
+            self.by_count.setdefault(count, {})[name] = None
+        else:
+            del self.counts[name]
+        if count > self.top:
+            self.top = count
+        while self.top and self.top not in self.by_count:
+            self.top -= 1
+
+    def leader(self, half_life=None, now=None):
+        if not self.entries:
+            return None
+        if not half_life:
+            return next(iter(self.by_count[self.top]))
+        # Decayed scores need the timestamps, but the window is bounded so
+        # this never grows with the number of accepts or solutions.
+        now = time.time() if now is None else now
+        scores = {}
+        for name, when in self.entries:
+            scores[name] = scores.get(name, 0.0) + math.pow(0.5, (now - when) / half_life)
+        return max(scores, key=scores.get)
+
+
+class TrendTracker(AcceptLog):
+    def __init__(self, path, window=TRENDY_WINDOW, half_life=None):
+        self.window = window
+        self.half_life = half_life
+        self.trends = {}
+        super().__init__(path)
+
+    def _reset(self):
+        self.trends = {}
+
+    def _apply(self, record):
+        problem = record["problem"]
+        trend = self.trends.get(problem)
+        if trend is None:
+            trend = self.trends[problem] = ProblemTrend(self.window)
+        trend.add(record["solution"], record.get("time", 0))
+
+    def _live(self):
+        return self.window * len(self.trends)
+
+    def _records(self):
+        return [{"problem": problem, "solution": name, "time": when}
+                for problem, trend in self.trends.items() for name, when in trend.entries]
+
+    def leader(self, problem):
+        trend = self.trends.get(problem)
+        return trend.leader(self.half_life) if trend else None
@@ -0,0 +1,101 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+# --- Change Watching ---
+# The GUIs and servers ask "did anything change on disk?" on every tick or
+# request, so the answer has to be cheap. On Linux an inotify watch on the
+# containing directory answers it with one non-blocking read (the directory,
+# because snapshots and journals are replaced by rename rather than rewritten
+# in place). Elsewhere, or if inotify cannot be set up, it falls back to
+# comparing each file's mtime and size. Either way the watcher only says
+# *that* something changed; storage.transaction() works out *what*.
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def storage_files(path):
+    """The files a storage at ``path`` changes: the snapshot or database, plus its journal or WAL."""
+    return [path, path + ".journal", path + "-wal"]
+
+
+def _libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+class ChangeWatcher:
+    """Reports whether any of ``paths`` changed since the previous ``changed()`` call."""
+
+    def __init__(self, paths, polling=False):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.names = {os.fsencode(os.path.basename(path)) for path in self.paths}
+        self._fd = None if polling else self._watch()
+        self._stamps = None if self._fd is not None else [_stamp(path) for path in self.paths]
+
+    @property
+    def mode(self):
+        return "polling" if self._fd is None else "inotify"
+
+    def _watch(self):
+        libc = _libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+
+    def changed(self):
+        if self._fd is None:
+            stamps = [_stamp(path) for path in self.paths]
+            changed, self._stamps = stamps != self._stamps, stamps
+            return changed
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                changed = changed or name in self.names
+                offset += _EVENT.size + length
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -1,11 +1,14 @@
 import os
-import json
-import random
-from collections import Counter
 import streamlit as st
+from decision_cache import SharedDecisions
+from decision_engine import format_rank_histogram, format_tie_set, solution_moods, solution_rank
+from decision_storage import STORAGE_ERRORS, VersionConflict
+from decision_rejections import RejectionStore
+from decision_timeline import AcceptTimeline
+from decision_trends import TrendTracker
 
 # --- Constants & Page Configuration ---
-DECISION_FILE = "decisions.json"
+DECISION_FILE = os.environ.get("DECISION_FILE", "decisions.json")
 st.set_page_config(
     page_title="Decision Fox",
     page_icon="🦊",
@@ -24,25 +27,33 @@ THEME_COLORS = {
 }
 
 # --- Data Handling Functions ---
-def load_json_file(filepath):
-    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-        with open(filepath, 'w') as f: json.dump({}, f)
-        return {}
-    try:
-        with open(filepath, 'r') as f: return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        st.error(f"Warning: {filepath} is corrupted. A new empty file will be used.")
-        return {}
+@st.cache_resource
+def get_shared_decisions(filepath):
+    # One copy per server process; sessions keep only their pending edits.
+    return SharedDecisions(filepath)
 
-def save_json_file(data, filepath):
-    try:
-        with open(filepath, 'w') as f: json.dump(data, f, indent=4)
-    except (OSError, PermissionError) as e: st.error(f"Error: Failed to save to {filepath}: {e}")
+@st.cache_resource
+def get_trend_tracker(filepath):
+    return TrendTracker(filepath + ".trends")
+
+@st.cache_resource
+def get_accept_timeline(filepath):
+    return AcceptTimeline(filepath + ".timeline")
+
+@st.cache_resource
+def get_rejection_store(filepath):
+    return RejectionStore(filepath + ".rejections")
+
+def save_change(change, *args):
+    try: change(*args)
+    except STORAGE_ERRORS as e: st.error(f"Error: Failed to save to {DECISION_FILE}: {e}")
 
 # --- Initialize Session State ---
 def init_state():
-    if 'decisions' not in st.session_state:
-        st.session_state.decisions = load_json_file(DECISION_FILE)
+    if 'pending_edits' not in st.session_state:
+        st.session_state.pending_edits = {}
+    if 'edit_widgets' not in st.session_state:
+        st.session_state.edit_widgets = {}  # widget key suffix -> (problem, solution name)
     if 'current_problem' not in st.session_state:
         st.session_state.current_problem = None
     if 'suggested_solution' not in st.session_state:
@@ -51,16 +62,44 @@ def init_state():
         st.session_state.result_message = ""
     if 'suggestion_reason' not in st.session_state:
         st.session_state.suggestion_reason = ""
-    if 'decision_log' not in st.session_state:
-        st.session_state.decision_log = []
-    if 'rejected_solutions' not in st.session_state:
-        st.session_state.rejected_solutions = {}
     if 'confirming_delete_problem' not in st.session_state:
         st.session_state.confirming_delete_problem = False
     if 'confirming_delete_solution' not in st.session_state:
         st.session_state.confirming_delete_solution = None
 
 init_state()
+shared = get_shared_decisions(DECISION_FILE)
+shared.refresh()
+decisions = shared.decisions
+
+# --- Pick Up Changes From Elsewhere ---
+# Only problems that changed since this session last drew them are touched:
+# their rank/mood widgets are reset to the saved values, except where the
+# session has unsaved edits, which are kept as they are.
+def forget_stale_widgets(changed):
+    for widget_key, (problem, name) in list(st.session_state.edit_widgets.items()):
+        if changed is not None and problem not in changed:
+            continue
+        if name not in st.session_state.pending_edits.get(problem, {}):
+            for key in (f"rank_input_{widget_key}", f"mood_input_{widget_key}"):
+                if key in st.session_state: del st.session_state[key]
+            del st.session_state.edit_widgets[widget_key]
+    for problem, pending in st.session_state.pending_edits.items():
+        if (changed is None or problem in changed) and pending:
+            names = {sol["solutions"] for sol in decisions.get(problem, [])}
+            for name in [name for name in pending if name not in names]:
+                del pending[name]
+
+changed = shared.changed_since(st.session_state.get("engine_stamp"))
+if changed is None or changed: forget_stale_widgets(changed)
+st.session_state.engine_stamp = shared.engine_stamp()
+trends = get_trend_tracker(DECISION_FILE)
+trends.refresh()
+timeline = get_accept_timeline(DECISION_FILE)
+timeline.refresh()
+rejections = get_rejection_store(DECISION_FILE)
+rejections.refresh()
+if shared.load_error: st.error(f"Warning: {DECISION_FILE} is corrupted. A new empty file will be used.")
 
 # --- Dynamic CSS for Theming ---
 css = f"""
@@ -92,10 +131,12 @@ with st.sidebar:
         st.markdown("""
         - **Default (Random)**: Picks any solution at random.
         - **Ranking**: Picks from solutions with the lowest rank number (1 is best).
-        - **Mood**: Suggests a solution matching your entered mood.
+        - **Mood**: Suggests a solution matching your entered moods; several can be given with commas, and a prefix or near-miss spelling finds the closest mood.
         - **Most Chosen**: Picks from solutions with the highest history count.
         - **Least Chosen**: Picks from solutions with the lowest history count.
         - **Trendy**: Picks the solution chosen most often in the last 5 accepted decisions.
+        - **Popular**: Picks the solution accepted most often in the last 7 days.
+        - **Weighted**: Picks solutions in proportion to how often each has been chosen.
         - **Avoid Repeats**: Prevents recently rejected solutions from being suggested.
         """)
 
@@ -107,7 +148,7 @@ col1, col2 = st.columns([2, 3])
 with col1:
     st.header("🤔 Problems & Solutions")
     with st.container(border=True):
-        problem_list = list(st.session_state.decisions.keys())
+        problem_list = list(decisions.keys())
         st.session_state.current_problem = st.selectbox("Select a Problem", options=problem_list, index=problem_list.index(st.session_state.current_problem) if st.session_state.current_problem in problem_list else None, placeholder="Choose a problem...")
         if st.session_state.current_problem:
             if st.button("Delete Current Problem", type="secondary", use_container_width=True):
@@ -115,17 +156,21 @@ with col1:
             if st.session_state.confirming_delete_problem:
                 st.warning(f"**Are you sure?** Deleting '{st.session_state.current_problem}' cannot be undone.")
                 if st.button("Confirm Deletion", type="primary"):
-                    del st.session_state.decisions[st.session_state.current_problem]
-                    save_json_file(st.session_state.decisions, DECISION_FILE)
+                    with shared.writing() as (engine, storage):
+                        engine.delete_problem(st.session_state.current_problem)
+                        save_change(storage.delete_problem, st.session_state.current_problem)
                     st.session_state.current_problem = None
                     st.session_state.confirming_delete_problem = False
                     st.rerun()
         st.markdown("---")
         new_problem_input = st.text_input("Or, add a new problem:")
         if st.button("Add Problem"):
-            if new_problem_input and new_problem_input not in st.session_state.decisions:
-                st.session_state.decisions[new_problem_input] = []
-                save_json_file(st.session_state.decisions, DECISION_FILE)
+            added = False
+            if new_problem_input:
+                with shared.writing() as (engine, storage):
+                    added = engine.add_problem(new_problem_input)
+                    if added: save_change(storage.add_problem, new_problem_input)
+            if added:
                 st.session_state.current_problem = new_problem_input
                 st.toast(f"Added problem: {new_problem_input}")
                 st.rerun()
@@ -137,95 +182,97 @@ with col1:
             new_solution_input = st.text_input("Add a new solution:")
             if st.button("Add Solution"):
                 if new_solution_input:
-                    problem_solutions = [s['solutions'] for s in st.session_state.decisions[st.session_state.current_problem]]
-                    if new_solution_input not in problem_solutions:
-                        st.session_state.decisions[st.session_state.current_problem].append({"solutions": new_solution_input, "ranking": 0, "mood": [], "history": 0})
-                        save_json_file(st.session_state.decisions, DECISION_FILE)
+                    with shared.writing() as (engine, storage):
+                        new_sol = engine.add_solution(st.session_state.current_problem, new_solution_input)
+                        if new_sol is not None: save_change(storage.put_solution, st.session_state.current_problem, new_sol)
+                    if new_sol is not None:
                         st.toast("Solution added!"); st.rerun()
                     else: st.warning("This solution already exists.")
                 else: st.warning("Solution cannot be empty.")
             st.markdown("---")
             st.subheader("📝 Edit Existing Solutions")
-            solutions = st.session_state.decisions[st.session_state.current_problem]
+            solutions = decisions[st.session_state.current_problem]
+            # Edits live in this session's overlay until saved; the shared
+            # solutions are never touched by a session that has not saved.
+            # Each edit keeps the rank and moods it started from; saving
+            # checks nobody else changed those since.
+            pending = st.session_state.pending_edits.setdefault(st.session_state.current_problem, {})
             if solutions:
                 for i, sol in enumerate(solutions):
                     sub_col1, sub_col2, sub_col3, sub_col4 = st.columns([4, 1, 3, 1])
                     sub_col1.write(sol['solutions'])
-                    st.session_state[f"rank_{i}"] = sub_col2.number_input("Rank", value=sol.get("ranking", 0), key=f"rank_input_{i}", label_visibility="collapsed", help="Rank (1 is best)")
-                    st.session_state[f"mood_{i}"] = sub_col3.text_input("Moods", value=", ".join(sol.get("mood", [])), key=f"mood_input_{i}", label_visibility="collapsed", help="Comma-separated moods")
+                    base_rank, base_moods = solution_rank(sol), ", ".join(solution_moods(sol))
+                    edit = pending.get(sol['solutions'], {})
+                    widget_key = repr((st.session_state.current_problem, sol['solutions']))
+                    st.session_state.edit_widgets[widget_key] = (st.session_state.current_problem, sol['solutions'])
+                    rank = sub_col2.number_input("Rank", value=edit.get("ranking", base_rank), key=f"rank_input_{widget_key}", label_visibility="collapsed", help="Rank (1 is best)")
+                    mood_text = sub_col3.text_input("Moods", value=edit.get("mood", base_moods), key=f"mood_input_{widget_key}", label_visibility="collapsed", help="Comma-separated moods")
+                    if rank != base_rank or mood_text != base_moods: pending[sol['solutions']] = {"ranking": rank, "mood": mood_text, "base": edit.get("base", (base_rank, tuple(solution_moods(sol))))}
+                    else: pending.pop(sol['solutions'], None)
                     if sub_col4.button("🗑️", key=f"del_{i}", help="Delete Solution"):
                         st.session_state.confirming_delete_solution = sol['solutions']
                     if st.session_state.confirming_delete_solution == sol['solutions']:
                         st.warning(f"Delete '{sol['solutions']}'? This cannot be undone.")
                         if st.button("Confirm", key=f"confirm_del_{i}"):
-                            st.session_state.decisions[st.session_state.current_problem] = [s for s in solutions if s['solutions'] != sol['solutions']]
-                            save_json_file(st.session_state.decisions, DECISION_FILE)
+                            with shared.writing() as (engine, storage):
+                                engine.delete_solution(st.session_state.current_problem, sol['solutions'])
+                                save_change(storage.delete_solution, st.session_state.current_problem, sol['solutions'])
+                            pending.pop(sol['solutions'], None)
                             st.session_state.confirming_delete_solution = None; st.rerun()
                 if st.button("Save All Changes", key="save_all_solutions"):
-                    for i, sol in enumerate(solutions):
-                        sol['ranking'] = st.session_state[f"rank_{i}"]
-                        sol['mood'] = [m.strip().lower() for m in st.session_state[f"mood_{i}"].split(',') if m.strip()]
-                    save_json_file(st.session_state.decisions, DECISION_FILE); st.success("All changes saved!")
+                    if pending:
+                        problem = st.session_state.current_problem
+                        try:
+                            with shared.writing(expect={problem: {name: edit["base"] for name, edit in pending.items()}}) as (engine, storage):
+                                changed = engine.apply_edits(problem, pending)
+                                if changed: save_change(storage.put_solutions, problem, changed)
+                            pending.clear()
+                            st.success("All changes saved!")
+                        except VersionConflict as e:
+                            with shared.lock:
+                                for name, edit in pending.items(): edit["base"] = shared.engine.edit_base(problem, name)
+                            st.warning(f"{', '.join(e.names)} changed elsewhere while you were editing. Review your edits against the updated solutions and save again.")
+                    else: st.info("There are no changes to save.")
             else: st.info("No solutions added yet.")
         else: st.info("Select a problem to manage solutions.")
 
 # RIGHT COLUMN
 with col2:
     st.header("🚀 Let's Choose!")
-    if st.session_state.current_problem and st.session_state.decisions.get(st.session_state.current_problem):
+    if st.session_state.current_problem and decisions.get(st.session_state.current_problem):
         with st.container(border=True):
             avoid_repeats = st.toggle("Avoid Repeats", help="Don't suggest solutions you have recently rejected.")
-            preference = st.radio("Choose by Preference:", ["default (random)", "ranking", "mood", "most chosen", "least chosen", "trendy"], horizontal=True)
+            preference = st.radio("Choose by Preference:", ["default (random)", "ranking", "mood", "most chosen", "least chosen", "trendy", "popular (this week)", "weighted (by history)"], horizontal=True)
             if st.button("Choose For Me!", type="primary", use_container_width=True):
                 st.session_state.suggested_solution, st.session_state.result_message, st.session_state.suggestion_reason = None, "", ""
-                solutions = st.session_state.decisions[st.session_state.current_problem]
-                eligible_solutions = solutions
+                problem = st.session_state.current_problem
+                exclude = None
                 if avoid_repeats:
-                    rejected = st.session_state.rejected_solutions.get(st.session_state.current_problem, set())
-                    eligible_solutions = [s for s in solutions if s['solutions'] not in rejected]
-                    if not eligible_solutions:
+                    exclude, all_excluded = shared.exclusion(rejections, problem)
+                    if all_excluded:
                         st.toast("All options have been rejected. Resetting 'Avoid Repeats' list.")
-                        st.session_state.rejected_solutions[st.session_state.current_problem] = set()
-                        eligible_solutions = solutions
+                        save_change(rejections.reset, problem)
+                        exclude = None
                 selected, reason = None, ""
                 pref_logic = preference.split(" ")[0]
                 if pref_logic == "ranking":
-                    ranked = [s for s in eligible_solutions if s.get("ranking", 0) > 0]
-                    if ranked:
-                        min_rank = min(s['ranking'] for s in ranked)
-                        best = [s for s in ranked if s['ranking'] == min_rank]
-                        selected, reason = random.choice(best), f"Chosen for its top rank of {min_rank}."
-                    else: st.warning("No solutions have been ranked yet.")
+                    selected, reason = shared.choose(problem, "ranking", exclude=exclude)
+                    if not selected: st.warning("No solutions have been ranked yet.")
                 elif pref_logic == "mood": st.session_state.result_message = "Please enter your current mood below."
-                elif pref_logic == "most chosen":
-                    hist_matches = [s for s in eligible_solutions if s.get("history", 0) > 0]
-                    if hist_matches:
-                        max_hist = max(s["history"] for s in hist_matches)
-                        most_chosen = [s for s in hist_matches if s["history"] == max_hist]
-                        selected, reason = random.choice(most_chosen), f"Chosen for being the most popular ({max_hist} times)."
-                elif pref_logic == "least chosen":
-                    min_hist = min(s.get("history", 0) for s in eligible_solutions)
-                    least_chosen = [s for s in eligible_solutions if s.get("history", 0) == min_hist]
-                    selected, reason = random.choice(least_chosen), f"Chosen for being picked least often ({min_hist} times)."
-                elif pref_logic == "trendy":
-                    if st.session_state.decision_log:
-                        last_5 = st.session_state.decision_log[-5:]
-                        if last_5:
-                            most_common = Counter(last_5).most_common(1)[0][0]
-                            for sol in eligible_solutions:
-                                if sol['solutions'] == most_common:
-                                    selected, reason = sol, "Chosen for being trendy recently."; break
-                if not selected and pref_logic != "mood" and eligible_solutions:
-                    selected, reason = random.choice(eligible_solutions), "Chosen at random."
+                elif pref_logic in ("most", "least", "trendy", "popular", "weighted"):
+                    selected, reason = shared.choose(problem, pref_logic, exclude=exclude, trends=trends, timeline=timeline)
+                if not selected and pref_logic != "mood":
+                    selected, reason = shared.choose(problem, "default", exclude=exclude)
                 st.session_state.suggested_solution = selected
                 st.session_state.suggestion_reason = reason
             if preference.startswith("mood"):
-                current_mood = st.text_input("Enter your current mood:")
+                current_mood = st.text_input("Enter your current mood:", help="Comma-separated moods")
+                match = st.radio("Match:", ["best", "any", "all"], horizontal=True, help="Best: the most moods matched. Any: at least one. All: every mood.")
                 if st.button("Find Solution by Mood"):
-                    mood_matches = [s for s in st.session_state.decisions[st.session_state.current_problem] if current_mood.lower() in s.get("mood", [])]
-                    if mood_matches:
-                        st.session_state.suggested_solution = random.choice(mood_matches)
-                        st.session_state.suggestion_reason = f"Chosen for matching the mood '{current_mood}'."; st.session_state.result_message = ""
+                    mood_match, mood_reason = shared.choose(st.session_state.current_problem, "mood", mood=current_mood, match=match)
+                    if mood_match:
+                        st.session_state.suggested_solution = mood_match
+                        st.session_state.suggestion_reason = mood_reason; st.session_state.result_message = ""
                     else: st.warning(f"No solutions found for the mood: '{current_mood}'.")
 
         if st.session_state.suggested_solution:
@@ -235,35 +282,28 @@ with col2:
                 st.markdown(f"## **{solution_text}**")
                 b_col1, b_col2 = st.columns(2)
                 if b_col1.button("✅ Accept", use_container_width=True):
-                    for sol in st.session_state.decisions[st.session_state.current_problem]:
-                        if sol['solutions'] == solution_text:
-                            sol['history'] = sol.get('history', 0) + 1
-                            st.session_state.decision_log.append(sol['solutions']); break
-                    save_json_file(st.session_state.decisions, DECISION_FILE)
+                    with shared.writing() as (engine, storage):
+                        accepted = engine.record_accept(st.session_state.current_problem, solution_text)
+                        if accepted is not None: save_change(storage.put_solution, st.session_state.current_problem, accepted)
+                    if accepted is not None:
+                        save_change(trends.record, st.session_state.current_problem, solution_text)
+                        save_change(timeline.record, st.session_state.current_problem, solution_text)
                     st.session_state.result_message, st.session_state.suggested_solution = "Decision accepted!", None; st.rerun()
                 if b_col2.button("❌ Reject", use_container_width=True):
-                    if st.session_state.current_problem not in st.session_state.rejected_solutions:
-                        st.session_state.rejected_solutions[st.session_state.current_problem] = set()
-                    st.session_state.rejected_solutions[st.session_state.current_problem].add(solution_text)
+                    if avoid_repeats:
+                        save_change(rejections.reject, st.session_state.current_problem, solution_text)
                     st.session_state.result_message, st.session_state.suggested_solution = "Decision rejected.", None; st.rerun()
         if st.session_state.result_message: st.success(st.session_state.result_message)
     else: st.info("Select a problem to get started.")
     with st.expander("📊 View Statistics", expanded=True):
         if st.session_state.current_problem:
-            stats_solutions = st.session_state.decisions.get(st.session_state.current_problem, [])
-            st.metric("Solution Count", len(stats_solutions))
-            if stats_solutions:
-                solutions_with_history = [s for s in stats_solutions if s.get("history", 0) > 0]
-                if solutions_with_history:
-                    max_history = max(s['history'] for s in solutions_with_history)
-                    most_chosen_list = [s['solutions'] for s in solutions_with_history if s['history'] == max_history]
-                    st.write(f"**Most Chosen:** {', '.join(most_chosen_list)} ({max_history} times)")
+            stats = shared.stats(st.session_state.current_problem, timeline=timeline)
+            st.metric("Solution Count", stats["count"])
+            if stats["count"]:
+                if stats["most_chosen"]: st.write(f"**Most Chosen:** {format_tie_set(stats['most_chosen'])}")
                 else: st.write("**Most Chosen:** None chosen yet.")
-                unchosen_solutions = [s['solutions'] for s in stats_solutions if s.get('history', 0) == 0]
-                if unchosen_solutions: st.write(f"**Least Chosen:** {', '.join(unchosen_solutions)} (0 times)")
-                elif solutions_with_history:
-                    min_history = min(s['history'] for s in solutions_with_history)
-                    least_chosen_list = [s['solutions'] for s in solutions_with_history if s['history'] == min_history]
-                    st.write(f"**Least Chosen:** {', '.join(least_chosen_list)} ({min_history} times)")
+                st.write(f"**Least Chosen:** {format_tie_set(stats['least_chosen'])}")
+                st.write(f"**Most Chosen This Week:** {format_tie_set(stats['popular']) if stats['popular'] else 'None this week.'}")
+                st.write(f"**Ranks:** {format_rank_histogram(stats)}")
             else: st.write("**Most Chosen:** No solutions yet.")
         else: st.info("Select a problem to view stats.")
\ No newline at end of file